@@ -0,0 +1,216 @@
+'''
+Benchmark
+=========
+Times the composition of every form of poetry on the shipped corpora,
+with fixed seeds, so that runs can be compared across commits.
+
+For each corpus and form, reports the p50, p95, p99 and maximum
+latency, the poems composed per second, the attempts made per poem,
+i.e. the lines generated and retried, and the retries among them,
+which are 0 for a poem composed on the first try (see budget.py). With
+--metrics, the counters and stage timings of metrics.py are added up
+for each form as well.
+
+Usage:
+------
+    python3 benchmark.py [--runs <runs>] [--engine <engine>] [--output <file>] [--compare <file>]
+
+    will compose the given number of poems of each form for each corpus,
+    print a table of the results, and optionally write them as JSON to
+    the output file, or compare them with an earlier JSON file
+'''
+
+import argparse
+import json
+import platform
+import random
+import time
+
+import os
+import sys
+
+from budget import BudgetExceeded, CompositionFailed
+from metrics import Metrics
+from poetry import Poet
+
+# Get the py-verse directory
+path = os.path.abspath(os.path.dirname(sys.argv[0]))
+
+CORPORA = ('data/english.txt', 'data/wonderland.txt')
+
+def percentile(values, q):
+    '''
+    Returns the q-th percentile of the sorted values, by nearest rank
+    '''
+
+    if len(values) == 0:
+        return None
+
+    rank = max(int(round(q / 100 * len(values))), 1)
+    return values[rank - 1]
+
+def bench_form(poet, form, runs, seed, timeout=None, warmup=1, metrics=False):
+    '''
+    Composes the given number of poems of the form, and returns a
+    dictionary of the latency and attempt statistics, and of the
+    metrics of all poems if asked for
+
+    The first warmup poems fill the caches of the Poet and are not
+    timed. Poems that run out of the timeout, or fail to compose, are
+    counted as failures.
+    '''
+
+    random.seed(seed)
+
+    for _ in range(warmup):
+        poet.compose(form)
+
+    latencies = []
+    attempts = []
+    retries = []
+    failures = 0
+
+    totals = Metrics() if metrics else None
+
+    start = time.perf_counter()
+
+    for _ in range(runs):
+        poem_start = time.perf_counter()
+
+        try:
+            with poet.budget(seconds=timeout) as budget:
+                if totals is None:
+                    poet.compose(form)
+                else:
+                    with poet.measure(totals):
+                        poet.compose(form)
+        except (BudgetExceeded, CompositionFailed):
+            failures += 1
+            continue
+
+        latencies.append(time.perf_counter() - poem_start)
+        attempts.append(budget.attempts)
+        retries.append(budget.retries)
+
+    total = time.perf_counter() - start
+
+    latencies.sort()
+
+    stats = {
+        'runs': runs,
+        'failures': failures,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'max': latencies[-1] if len(latencies) > 0 else None,
+        'mean': sum(latencies) / len(latencies) if len(latencies) > 0 else None,
+        'poems_per_sec': len(latencies) / total if total > 0 else None,
+        'attempts_mean': sum(attempts) / len(attempts) if len(attempts) > 0 else None,
+        'attempts_max': max(attempts) if len(attempts) > 0 else None,
+        'retries_mean': sum(retries) / len(retries) if len(retries) > 0 else None,
+        'retries_max': max(retries) if len(retries) > 0 else None,
+    }
+
+    if totals is not None:
+        stats['metrics'] = totals.export()
+
+    return stats
+
+def bench(corpora=CORPORA, forms=Poet.FORMS, runs=20, seed=0, engine='random', timeout=None, warmup=1, 
+    metrics=False):
+    '''
+    Benchmarks every form on every corpus, and returns the results as
+    a dictionary that can be written as JSON
+    '''
+
+    results = {
+        'engine': engine,
+        'runs': runs,
+        'seed': seed,
+        'timeout': timeout,
+        'warmup': warmup,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'corpora': {},
+    }
+
+    for corpus in corpora:
+        start = time.perf_counter()
+        poet = Poet(path + '/' + corpus, engine)
+        load_time = time.perf_counter() - start
+
+        results['corpora'][corpus] = {
+            'load_seconds': load_time,
+            'forms': {form: bench_form(poet, form, runs, seed, timeout, warmup, metrics) for form in forms},
+        }
+
+    return results
+
+def seconds(value):
+    '''
+    Formats a number of seconds for the table
+    '''
+
+    if value is None:
+        return '-'
+
+    return '%.4fs' % value
+
+def print_results(results, baseline=None):
+    '''
+    Prints the results as a table, with the ratio of each p50 latency
+    to that of the baseline results, if given
+    '''
+
+    for corpus, corpus_results in results['corpora'].items():
+        print('\n%s (loaded in %.2fs)\n' % (corpus, corpus_results['load_seconds']))
+
+        header = 'Poem | p50 | p95 | p99 | Maximum | Poems/sec | Attempts | Retries |'
+        if baseline is not None:
+            header += ' p50 vs baseline |'
+        print(header)
+        print('|:---:' + '|---:' * (header.count('|') - 1) + '|')
+
+        for form, stats in corpus_results['forms'].items():
+            row = '%s | %s | %s | %s | %s | %.1f | %.1f | %.1f |' % (form,
+                seconds(stats['p50']), seconds(stats['p95']), seconds(stats['p99']),
+                seconds(stats['max']), stats['poems_per_sec'] or 0, stats['attempts_mean'] or 0,
+                stats.get('retries_mean') or 0)
+
+            if baseline is not None:
+                try:
+                    old = baseline['corpora'][corpus]['forms'][form]['p50']
+                    row += ' %.2fx |' % (stats['p50'] / old)
+                except (KeyError, TypeError, ZeroDivisionError):
+                    row += ' - |'
+
+            if stats['failures'] > 0:
+                row += ' (%d timed out)' % stats['failures']
+
+            print(row)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the composition of every form of poetry')
+    parser.add_argument('--runs', type=int, default=20, help='poems composed per form and corpus')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of each form')
+    parser.add_argument('--engine', default='random', choices=Poet.ENGINES, help='composition engine')
+    parser.add_argument('--timeout', type=float, default=None, help='seconds allowed for each poem')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed poems composed first per form')
+    parser.add_argument('--corpus', action='append', default=None, help='corpus to benchmark, may be repeated')
+    parser.add_argument('--form', action='append', default=None, help='form to benchmark, may be repeated')
+    parser.add_argument('--metrics', action='store_true', help='add up the metrics of each form')
+    parser.add_argument('--output', default=None, help='file to write the results to as JSON')
+    parser.add_argument('--compare', default=None, help='JSON file of earlier results to compare with')
+    args = parser.parse_args()
+
+    results = bench(args.corpus or CORPORA, args.form or Poet.FORMS,
+        args.runs, args.seed, args.engine, args.timeout, args.warmup, args.metrics)
+
+    baseline = None
+    if args.compare is not None:
+        baseline = json.load( open(args.compare) )
+
+    print_results(results, baseline)
+
+    if args.output is not None:
+        json.dump(results, open(args.output, 'w'), indent=2)
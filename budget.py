@@ -0,0 +1,98 @@
+'''
+Composition Budget
+==================
+Limits on the time and number of attempts spent composing a poem,
+so that an unlucky corpus cannot keep the Poet retrying forever.
+
+A budget is checked by the Poet at every line it generates and at
+every retry, and once it runs out, the composition fails fast with
+a BudgetExceeded error carrying the number of attempts made.
+
+A poem that cannot be composed at all, e.g. for lack of a seed line
+with enough rhymes, fails with a CompositionFailed error instead, so
+that a caller composing many poems can skip it and move on.
+
+Usage:
+------
+    >>> p = Poet('data/wonderland.txt')
+    >>> try:
+    ...     with p.budget(seconds=5, attempts=10000):
+    ...         print(p.string_limerick())
+    ... except BudgetExceeded as e:
+    ...     print('Gave up after %d attempts' % e.attempts)
+'''
+
+from concurrent.futures import CancelledError
+import time
+
+class BudgetExceeded(RuntimeError):
+    '''
+    Raised when a composition runs out of its budget
+    '''
+
+    def __init__(self, reason, attempts, elapsed):
+        super().__init__(reason, attempts, elapsed)
+
+        self.reason = reason
+        self.attempts = attempts
+        self.elapsed = elapsed
+
+class CompositionFailed(ValueError):
+    '''
+    Raised when a poem cannot be composed, which may or may not happen
+    again on another try
+
+    A ValueError, as the Poet raised before, so existing handlers still
+    catch it
+    '''
+
+class Budget(object):
+    '''
+    Budget of seconds and attempts for a composition, either of which
+    may be None for no limit
+
+    The composition can also be cancelled from another thread by
+    setting the cancel event, in which case it raises CancelledError.
+    '''
+
+    def __init__(self, seconds=None, attempts=None, cancel=None):
+        self.start = time.monotonic()
+
+        if seconds is None:
+            self.deadline = None
+        else:
+            self.deadline = self.start + seconds
+
+        self.max_attempts = attempts
+        self.cancel = cancel
+
+        # Lines and retries attempted so far, and the retries among them
+        self.attempts = 0
+        self.retries = 0
+
+    def elapsed(self):
+        '''
+        Returns the number of seconds since the budget was started
+        '''
+
+        return time.monotonic() - self.start
+
+    def spend(self, retry=False):
+        '''
+        Counts an attempt, which is a retry unless it is a new line, and
+        raises an error if the budget has run out or the composition has
+        been cancelled
+        '''
+
+        self.attempts += 1
+        if retry:
+            self.retries += 1
+
+        if self.cancel is not None and self.cancel.is_set():
+            raise CancelledError
+
+        if self.max_attempts is not None and self.attempts > self.max_attempts:
+            raise BudgetExceeded('Out of attempts', self.attempts, self.elapsed())
+
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExceeded('Out of time', self.attempts, self.elapsed())
@@ -0,0 +1,134 @@
+'''
+Corpus Loading
+==============
+Streams a corpus of text in fixed-size chunks and collects its
+vocabulary, so that texts of any size can be loaded in bounded
+memory, rather than reading the whole file and splitting it.
+
+Usage:
+------
+    >>> word_list = vocabulary('data/english.txt', cmudict.dict(), progress=True)
+'''
+
+import codecs
+import locale
+import re
+import sys
+
+import os
+
+# Read a megabyte of text at a time
+CHUNK_SIZE = 1 << 20
+
+# Runs of characters that are not letters
+# Note that \w also matches numerals other than digits, see sanitize()
+NON_ALPHA = re.compile(r'[\W\d_]+')
+
+# Print iterations progress
+def printProgress (iteration, total, prefix = '', suffix = '', decimals = 1, barLength = 100):
+    '''
+    Call in a loop to create terminal progress bar
+    @params:
+        iteration   - Required  : current iteration (Int)
+        total       - Required  : total iterations (Int)
+        prefix      - Optional  : prefix string (Str)
+        suffix      - Optional  : suffix string (Str)
+        decimals    - Optional  : positive number of decimals in percent complete (Int)
+        barLength   - Optional  : character length of bar (Int)
+
+    Credit: http://stackoverflow.com/a/34325723
+    '''
+    formatStr       = "{0:." + str(decimals) + "f}"
+    percents        = formatStr.format(100 * (iteration / float(total)))
+    filledLength    = int(round(barLength * iteration / float(total)))
+    bar             = '█' * filledLength + '-' * (barLength - filledLength)
+    sys.stdout.write('\r%s |%s| %s%s %s' % (prefix, bar, percents, '%', suffix)),
+    if iteration == total:
+        sys.stdout.write('\n')
+    sys.stdout.flush()
+
+def sanitize(word):
+    '''
+    Strips word of all nonalpha characteres
+    '''
+
+    # Most words are letters only
+    if word.isalpha():
+        return word.lower()
+
+    result = NON_ALPHA.sub('', word)
+
+    # Fall back on checking each letter for the odd numeral left over
+    if len(result) > 0 and not result.isalpha():
+        result = ''.join(letter for letter in result if letter.isalpha())
+
+    return result.lower()
+
+def chunks(filename, chunk_size=CHUNK_SIZE, progress=False):
+    '''
+    Yields the text of the file in chunks that end on whitespace, so
+    that no word is split between two chunks, unless the word is longer
+    than a chunk itself
+    '''
+
+    total = max(os.path.getsize(filename), 1)
+    decoder = codecs.getincrementaldecoder(locale.getpreferredencoding(False))()
+
+    if progress:
+        printProgress(0, total, prefix = 'Progress:', suffix = 'Complete', barLength = 50)
+
+    with open(filename, 'rb') as file:
+        rest = ''
+        read = 0
+
+        while True:
+            data = file.read(chunk_size)
+            text = rest + decoder.decode(data, final=len(data) == 0)
+
+            if len(data) == 0:
+                if len(text) > 0:
+                    yield text
+                break
+
+            # Hold back the last word, which may continue in the next chunk
+            end = len(text)
+            while end > 0 and not text[end - 1].isspace():
+                end -= 1
+
+            if end > 0:
+                yield text[:end]
+                rest = text[end:]
+            elif len(text) >= chunk_size:
+                # A word longer than a chunk is no word of the dictionary,
+                # so flush it rather than hold the whole file back
+                yield text
+                rest = ''
+            else:
+                rest = text
+
+            read += len(data)
+            if progress and read < total:
+                printProgress(read, total, prefix = 'Progress:', suffix = 'Complete', barLength = 50)
+
+    if progress:
+        printProgress(total, total, prefix = 'Progress:', suffix = 'Complete', barLength = 50)
+
+def vocabulary(filename, dictionary, chunk_size=CHUNK_SIZE, progress=False):
+    '''
+    Returns the set of all unique words in the corpus of text that are
+    in the dictionary
+
+    The file is read in chunks, and each distinct token of a chunk is
+    only sanitized once, so memory is bounded by the chunk size and the
+    size of the vocabulary
+    '''
+
+    word_list = set()
+
+    for text in chunks(filename, chunk_size, progress):
+        for token in set(text.split()):
+            clean_word = sanitize(token)
+            if clean_word in dictionary:
+                word_list.add(clean_word)
+
+    return word_list
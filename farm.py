@@ -0,0 +1,159 @@
+'''
+Poem Farm
+=========
+Composes poems on a pool of worker processes, so that composition,
+which is pure CPU, can use every core of the machine.
+
+The dictionaries are loaded once, and the workers are forked after
+loading, so they share its pages rather than each unpickling the
+dictionaries again. With a compiled lexicon (see lexicon.py), the
+memory-mapped file itself is shared.
+
+Each request names a form of poetry, and may be given a timeout,
+after which the worker gives up on the poem and moves on to the next
+request. The timeout is a budget of the Poet (see budget.py), checked
+between lines, so a poem is never cut off in the middle of filling a
+cache. Poems are returned as soon as they are composed.
+
+Usage:
+------
+    >>> farm = PoemFarm(workers=32)
+    >>> for index, form, poem in farm.compose(['villanelle', 'ballade'] * 50, timeout=10):
+    ...     print(poem)
+    >>> farm.close()
+
+    python3 farm.py <form> <count> [--workers <workers>] [--timeout <seconds>]
+
+    will print the given number of poems of the form as they are composed
+'''
+
+import argparse
+import multiprocessing
+import random
+
+import os
+
+from budget import BudgetExceeded, CompositionFailed
+from poetry import Poet
+
+# Poet shared with the worker processes
+# When processes are forked, its pages are shared rather than copied
+shared = None
+
+def share(poet):
+    '''
+    Sets the Poet shared with a worker process
+    '''
+
+    global shared
+    shared = poet
+
+def start_worker():
+    '''
+    Prepares a forked worker process for composing poems
+    '''
+
+    # Forked workers inherit the random state, and would otherwise all
+    # compose the very same poems
+    random.seed()
+
+def compose_request(request):
+    '''
+    Composes the poem of a request in a worker process, or None if it
+    could not be composed in time, or at all
+    '''
+
+    index, form, timeout = request
+
+    try:
+        with shared.budget(seconds=timeout or None):
+            poem = shared.compose(form)
+    except (BudgetExceeded, CompositionFailed):
+        poem = None
+
+    return (index, form, poem)
+
+class PoemFarm(object):
+    '''
+    Pool of worker processes composing poems with a shared Poet
+    '''
+
+    def __init__(self, workers=None, poet=None, filename=None, engine='random', warm=()):
+        if workers is None:
+            workers = os.cpu_count()
+
+        if poet is None:
+            poet = Poet(filename, engine)
+
+        self.poet = poet
+
+        # Compose the given forms once before forking, so that the workers
+        # start with the caches of the Poet already filled
+        for form in warm:
+            poet.compose(form)
+
+        share(poet)
+
+        context = multiprocessing.get_context('fork')
+        self.pool = context.Pool(workers, initializer=start_worker)
+
+    def compose(self, forms, timeout=None):
+        '''
+        Composes a poem of each of the given forms, and yields a tuple of
+        (index, form, poem) for each one in the order they are completed
+
+        The form is one of Poet.FORMS, or 'random' for a random form. If
+        a timeout is given, a worker gives up on a poem after that many
+        seconds, and its poem is None.
+        '''
+
+        requests = []
+        for index, form in enumerate(forms):
+            if form != 'random' and form not in Poet.FORMS:
+                raise ValueError('Unknown form of poetry', form)
+
+            requests.append((index, form, timeout))
+
+        for result in self.pool.imap_unordered(compose_request, requests):
+            yield result
+
+    def compose_many(self, form, n, timeout=None):
+        '''
+        Composes n poems of the given form, and yields each one as soon
+        as it is completed, leaving out the poems that timed out
+        '''
+
+        for index, form, poem in self.compose([form] * n, timeout):
+            if poem is not None:
+                yield poem
+
+    def close(self):
+        '''
+        Stops the worker processes
+        '''
+
+        self.pool.terminate()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compose poems on a pool of worker processes')
+    parser.add_argument('form', help='form of poetry, or random')
+    parser.add_argument('count', type=int, help='number of poems')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--timeout', type=float, default=None, help='seconds allowed for each poem')
+    parser.add_argument('--engine', default='random', choices=Poet.ENGINES, help='composition engine')
+    parser.add_argument('--corpus', default=None, help='path to corpus of text')
+    args = parser.parse_args()
+
+    with PoemFarm(args.workers, filename=args.corpus, engine=args.engine) as farm:
+        for index, form, poem in farm.compose([args.form] * args.count, args.timeout):
+            if poem is None:
+                print('Poem %d timed out\n' % index)
+            else:
+                print(poem)
@@ -8,17 +8,47 @@ Pronunciation Dictionary
 All rhymes are pulled from Google's 10,000 most common 
 English words.
 
+Nothing is loaded on import. The pronunciation dictionary and the
+word list, also found as lang_utils.p_dict and lang_utils.word_list,
+are loaded on first use and kept, so that tools needing only
+sanitize() or a few stresses start at once. If the corpus has a
+binary lexicon compiled by lexicon.py, stresses and the word list
+are taken from it rather than from the Natural Language Toolkit.
+
 Usage:
 ------
+    >>> import lang_utils
+    >>> lang_utils.init('data/wonderland.txt')     # optional
+    >>> lang_utils.stress('wonderland')
+
+or, with p_dict and word_list loaded at start,
+
     python3 -i lang_utils.py
 '''
 
-import nltk
-from nltk.corpus import cmudict
-import sys
+import functools
 import os
 
-path = os.getcwd()
+from corpus import vocabulary
+from lexicon import Lexicon
+from rhyme_index import pack_rhyme_trie, rhyme_level as optimal_level, rhyme_levels, strip_stress
+from rhyme_set import RhymeTrie
+
+# Get the py-verse directory
+path = os.path.dirname(os.path.abspath(__file__))
+
+# Corpus and binary lexicon to load on first use, see init()
+corpus_file = 'data/english.txt'
+lexicon_file = None
+
+# Pronunciation dictionary, word list, lexicon and rhyme trie, once loaded
+loaded = {}
+
+# Results of the language methods for each word, see memoize()
+memos = {}
+
+# Number of results kept for each language method
+MEMO_SIZE = 50000
 
 ########################
 ### Helper Functions ###
@@ -32,74 +62,196 @@ def sanitize(word):
     result = ''.join(letter for letter in word if letter.isalpha())
     return result.lower()
 
-def load(filename):
+def load(filename, progress=False):
     '''
     Overwrites the 10,000 most common English words with a new
     set of words generated from a corpus of text
+
+    The corpus is streamed in chunks, see corpus.py
+    '''
+
+    return vocabulary(os.path.join(path, filename), pronunciations(), progress=progress)
+
+def init(filename='data/english.txt', lexicon=None):
+    '''
+    Sets the corpus to draw rhymes from, and the binary lexicon to look
+    up stresses in, which defaults to the one compiled for the corpus,
+    if any. Nothing is loaded until first use.
+    '''
+
+    global corpus_file, lexicon_file
+
+    corpus_file = filename
+    lexicon_file = lexicon
+
+    # The pronunciations do not depend on the corpus
+    for name in ('word_list', 'lexicon', 'trie'):
+        loaded.pop(name, None)
+
+    memos.clear()
+
+def pronunciations():
+    '''
+    Returns the CMU pronunciation dictionary, loading it on first use
+    '''
+
+    try:
+        return loaded['p_dict']
+    except KeyError:
+        pass
+
+    from nltk.corpus import cmudict
+
+    loaded['p_dict'] = cmudict.dict()
+    return loaded['p_dict']
+
+def binary_lexicon():
+    '''
+    Returns the binary lexicon of the corpus, or None if it has not
+    been compiled, opening it on first use
+    '''
+
+    try:
+        return loaded['lexicon']
+    except KeyError:
+        pass
+
+    filename = lexicon_file
+    if filename is None:
+        filename = os.path.splitext(corpus_file)[0] + '.lex'
+
+    filename = os.path.join(path, filename)
+    loaded['lexicon'] = Lexicon(filename) if os.path.exists(filename) else None
+    return loaded['lexicon']
+
+def words():
+    '''
+    Returns the word list of the corpus, loading it on first use
+
+    The word list of a bundled lexicon is taken from the bundle
+    '''
+
+    try:
+        return loaded['word_list']
+    except KeyError:
+        pass
+
+    lexicon = binary_lexicon()
+
+    if lexicon is not None and lexicon.is_bundle():
+        loaded['word_list'] = lexicon.corpus_words()
+    else:
+        loaded['word_list'] = load(corpus_file)
+
+    return loaded['word_list']
+
+def rhyme_trie():
+    '''
+    Returns the reversed-phoneme trie of the word list, which finds the
+    rhymes of any word at any level (see rhyme_set.py), building it on
+    first use
+    '''
+
+    try:
+        return loaded['trie']
+    except KeyError:
+        pass
+
+    p_dict = pronunciations()
+    word_list = sorted(set(words()))
+
+    phonemes, keys, key_words, levels = pack_rhyme_trie(word_list, p_dict,
+        rhyme_levels(word_list, p_dict))
+
+    loaded['trie'] = RhymeTrie(word_list, keys, key_words, levels, phonemes)
+    return loaded['trie']
+
+def memoize(method):
     '''
-    word_list = set()
+    Decorates a language method, so that its result for each word is
+    kept until the corpus is changed by init(), or MEMO_SIZE results
+    have been kept for the method
+    '''
+
+    @functools.wraps(method)
+    def wrapper(*args):
+        results = memos.setdefault(method.__name__, {})
+
+        try:
+            return results[args]
+        except KeyError:
+            result = method(*args)
+
+            if len(results) >= MEMO_SIZE:
+                results.clear()
+            results[args] = result
+            return result
 
-    file = open(path + '/' + filename)
-    raw_text = file.read().split()
-    for word in raw_text:
-        clean_word = sanitize(word)
-        if clean_word in p_dict:
-            word_list.update([clean_word])
+    return wrapper
 
-    return word_list
+def __getattr__(name):
+    '''
+    Loads the module-level dictionary and word list on first access
+
+    Only called on import, as the globals of a script are looked up
+    directly, see the end of the module
+    '''
+
+    if name == 'p_dict':
+        return pronunciations()
+    if name == 'word_list':
+        return words()
+
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
 ########################
 ### Language Methods ###
 ########################
 
-p_dict = cmudict.dict()
-word_list = load('data/english.txt')
-
 def rhyme_set(input_word, level):
     '''
     Returns set of all words that rhyme with the input word at given level,
     i.e. the number of element matches in the pronunciation
+
+    The set is a copy, which the caller may modify
+    '''
+
+    return set(shared_rhyme_set(input_word, level))
+
+@memoize
+def shared_rhyme_set(input_word, level):
     '''
+    Returns the rhymes of rhyme_set() as an immutable set, which is
+    shared by later queries
 
-    # Get the pronunciation of the word
-    raw_syllables = p_dict[input_word]
+    The rhymes are found in the trie of the word list, see rhyme_trie()
+    '''
 
-    # Discard stresses
-    syllables = []
-    for syllable in raw_syllables:
-        syllables += [list(map(sanitize, syllable))]
+    trie = rhyme_trie()
 
     total_rhymes = set()
 
     # Find all matching pronunciations, i.e. rhymes, of word
-    for syllable in syllables:
-        rhymes = []
-        for word in word_list:
-            for raw_pron in p_dict[word]:
-                # Discard stresses
-                pron = list(map(sanitize, raw_pron))
-                if pron[-level:] == syllable[-level:] and pron != syllable:
-                    rhymes += [word]
+    for syllable in pronunciations()[input_word]:
+        total_rhymes.update(trie.find(strip_stress(syllable), level))
 
-        rhyming_set = set(rhymes)
-        total_rhymes.update(rhyming_set)
+    return frozenset(total_rhymes)
 
-    return total_rhymes
-
-def rhyme(word):
+def rhyme(word, level=None):
     '''
     Determines the optimal rhyme level for a word and returns the 
-    corresponding rhyme set
+    corresponding rhyme set, or the rhyme set at the given level, 
+    e.g. a lower one for slant rhymes
     '''
-    num_elements = len(p_dict[word][0])
-    if num_elements < 4:
-        rhyme_level = num_elements
+    if level is not None:
+        rhyme_level = level
     else:
-        rhyme_level = num_elements - 1
+        rhyme_level = optimal_level(pronunciations()[word][0])
 
     # Get the rhyming set
     return rhyme_set(word, rhyme_level)
 
+@memoize
 def stress(word):
     '''
     Returns syllable pattern of input word
@@ -107,6 +259,13 @@ def stress(word):
     The '*' denotes a one syllable word, i.e. indeterminate stress
     '''
 
+    # Look the stress up in the lexicon, if compiled
+    lexicon = binary_lexicon()
+    if lexicon is not None and word.lower() in lexicon:
+        return lexicon[word.lower()][0]
+
+    p_dict = pronunciations()
+
     # Check if word in dictionary
     if word.lower() not in p_dict:
         raise KeyError('Word not found in CMU dictionary', word)
@@ -131,8 +290,17 @@ def syllables(word):
     Groups phonemes into syllable clusters
     '''
 
+    return [list(syl) for syl in syllable_clusters(word)]
+
+@memoize
+def syllable_clusters(word):
+    '''
+    Groups phonemes into syllable clusters, as tuples shared by later
+    queries
+    '''
+
     # Get the phonemes
-    phonemes = p_dict[word][0]
+    phonemes = pronunciations()[word][0]
 
     # Initialize list to hold syllables and running syllable list
     syls = []
@@ -154,9 +322,10 @@ def syllables(word):
     else:
         syls.append(syl)
 
-    return syls
+    return tuple(map(tuple, syls))
 
-def complexity(self, word):
+@memoize
+def complexity(word):
     '''
     Stoel-Gammon's Word Complexity Measure
 
@@ -164,9 +333,9 @@ def complexity(self, word):
     application to developmental phonology and disorders. Clinical
     Linguistics and Phonetics 24(4-5): 271-282.
     '''
-    phonemes = p_dict[word][0]
+    phonemes = pronunciations()[word][0]
     stress_pattern = stress(word)
-    syllables = syllables(word)
+    syls = syllable_clusters(word)
 
     # Constant phoneme classses
     VELARS = set("K G NG".split())
@@ -192,7 +361,7 @@ def complexity(self, word):
 
     # (2) Syllable clusters, i.e. syllable with more than two consonants, receive
     # one point for each cluster
-    for syl in syllables:
+    for syl in syls:
         if len(syl) > 2:
             score += 1
 
@@ -215,4 +384,69 @@ def complexity(self, word):
 
     # Some words have no syllables
     except:
-        return 100.0
\ No newline at end of file
+        return 100.0
+
+#####################
+### Batch Methods ###
+#####################
+
+def batch(method, words):
+    '''
+    Applies a language method to each distinct word of an iterable,
+    e.g. the tokens of a document, and returns a dictionary of the
+    results, which are None for words missing from the dictionary
+    '''
+
+    results = {}
+
+    for word in words:
+        if word in results:
+            continue
+
+        try:
+            results[word] = method(word)
+        except KeyError:
+            results[word] = None
+
+    return results
+
+def rhyme_set_many(words, level):
+    '''
+    Returns a dictionary of the rhyme sets of the words at given level
+    '''
+
+    return batch(lambda word: rhyme_set(word, level), words)
+
+def rhyme_many(words, level=None):
+    '''
+    Returns a dictionary of the rhyme sets of the words, each at its
+    optimal level unless given one
+    '''
+
+    return batch(lambda word: rhyme(word, level), words)
+
+def stress_many(words):
+    '''
+    Returns a dictionary of the syllable patterns of the words
+    '''
+
+    return batch(stress, words)
+
+def syllables_many(words):
+    '''
+    Returns a dictionary of the syllable clusters of the words
+    '''
+
+    return batch(syllables, words)
+
+def complexity_many(words):
+    '''
+    Returns a dictionary of the complexities of the words
+    '''
+
+    return batch(complexity, words)
+
+if __name__ == '__main__':
+    # Module __getattr__ does not apply to the globals of a script
+    p_dict = pronunciations()
+    word_list = words()
@@ -0,0 +1,418 @@
+'''
+Binary Lexicon
+==============
+Compact on-disk format for the stress dictionary and the rhyming
+dictionary, which is memory-mapped rather than unpickled, so that
+loading is close to instant and forked processes share its pages.
+
+The words are kept once, in sorted order, and are referred to by
+their index everywhere else. Stress patterns are interned into a
+small table, and the rhyme classes of the rhyming dictionary (see
+rhyme_index.py) are stored as offset and index arrays into the word
+table, so each class is only held once.
+
+A lexicon is normally compiled as a bundle for a single corpus,
+holding only the words of the corpus, which is much smaller and
+faster to load than the full stress dictionary.
+
+File layout:
+------------
+    header      magic, version, byte order and number of sections
+    sections    table of (name, offset, length) for each section
+    words       sorted words, UTF-8 encoded back to back
+    woffsets    uint32 offsets of each word, plus the end offset
+    stresses    interned stress patterns, back to back
+    soffsets    uint32 offsets of each stress pattern
+    stress      uint16 stress pattern of each word
+    complex     float64 complexity of each word
+    nsyl        uint8 number of syllables of each word
+    corpus      uint8 flag of whether each word is in the corpus
+                (only in bundles)
+    coffsets    uint32 offsets of each rhyme class in members
+    members     uint32 indices of the words of each class
+    eoffsets    uint32 offsets of each word's entries in eclasses
+    eclasses    uint32 class of each entry
+    xoffsets    uint32 offsets of each entry's words in excluded
+    excluded    uint32 indices of the words an entry leaves out
+
+Usage:
+------
+    python3 lexicon.py [<path to corpus>] [--full]
+
+    will bundle the words of the corpus (by default 'data/english.txt')
+    from 'data/cmudict.pkl' and the rhyming dictionary [<filename>].pkl
+    into the file [<filename>].lex
+
+    With --full, the whole stress dictionary is kept.
+'''
+
+from array import array
+from collections.abc import Mapping
+import mmap
+import pickle
+import struct
+import sys
+
+import os
+path = os.getcwd()
+
+from corpus import vocabulary
+from rhyme_set import RhymeClasses, load_rhyme_dict
+
+MAGIC = b'POETLEX\0'
+VERSION = 2
+
+# Magic, version, byte order and number of sections
+HEADER = struct.Struct('<8sIII')
+
+# Section name, offset and length
+SECTION = struct.Struct('<8sQQ')
+
+# Array sections and their type codes
+TYPECODES = {
+    'woffsets': 'I',
+    'soffsets': 'I',
+    'stress': 'H',
+    'complex': 'd',
+    'nsyl': 'B',
+    'corpus': 'B',
+    'coffsets': 'I',
+    'members': 'I',
+    'eoffsets': 'I',
+    'eclasses': 'I',
+    'xoffsets': 'I',
+    'excluded': 'I',
+}
+
+BYTE_ORDERS = {'little': 0, 'big': 1}
+
+# Words the Poet needs from outside of the corpus, for the love poem
+EXTRA_WORDS = ('roses', 'are', 'red')
+
+def write_lexicon(out_file, stress_dict, rhyme_dict, corpus=None):
+    '''
+    Writes the stress dictionary, mapping words to (stress, complexity)
+    tuples, and the rhyming dictionary, loaded as RhymeClasses, to a
+    binary lexicon file
+
+    If the word list of a corpus is given, only the words of the corpus
+    are written, bundled with the few extra words the Poet needs
+    '''
+
+    if corpus is None:
+        words = sorted(stress_dict)
+    else:
+        corpus = set(corpus)
+        words = sorted(word for word in corpus.union(EXTRA_WORDS) if word in stress_dict)
+    ids = {word: i for i, word in enumerate(words)}
+
+    # Intern the stress patterns
+    stress_ids = {}
+    for word in words:
+        stress_ids.setdefault(stress_dict[word][0], len(stress_ids))
+    stresses = sorted(stress_ids, key=stress_ids.get)
+
+    sections = {}
+
+    encoded = [word.encode('utf-8') for word in words]
+    sections['words'] = b''.join(encoded)
+    sections['woffsets'] = offsets(encoded)
+
+    encoded = [stress.encode('ascii') for stress in stresses]
+    sections['stresses'] = b''.join(encoded)
+    sections['soffsets'] = offsets(encoded)
+
+    sections['stress'] = array('H', (stress_ids[stress_dict[word][0]] for word in words))
+    sections['complex'] = array('d', (stress_dict[word][1] for word in words))
+    sections['nsyl'] = array('B', (len(stress_dict[word][0]) for word in words))
+
+    if corpus is not None:
+        sections['corpus'] = array('B', (word in corpus for word in words))
+
+    sections.update(rhyme_sections(rhyme_dict, words, ids))
+
+    write_sections(out_file, sections)
+
+def rhyme_sections(rhyme_dict, words, ids):
+    '''
+    Returns the sections of the rhyme classes of the words, renumbered
+    into the word table, leaving out the words missing from it and the
+    entries left without rhymes
+    '''
+
+    # Classes in the order of first use, as lists of word table indices
+    class_ids = {}
+    class_members = []
+
+    entry_offsets = array('I', [0])
+    entry_classes = array('I')
+    excluded_offsets = array('I', [0])
+    excluded = array('I')
+
+    for word in words:
+        index = rhyme_dict.index(word)
+        for entry in (rhyme_dict.entries(index) if index is not None else ()):
+            class_id = rhyme_dict.entry_classes[entry]
+
+            if class_id not in class_ids:
+                members = sorted(ids[other] for other in rhyme_dict.class_set(class_id) if other in ids)
+                class_ids[class_id] = (len(class_members), members)
+                class_members.append(members)
+            new_id, members = class_ids[class_id]
+
+            others = sorted(ids[other] for other in rhyme_dict.excluded_words(entry) if other in ids)
+            if len(others) == len(members):
+                continue
+
+            entry_classes.append(new_id)
+            excluded.extend(others)
+            excluded_offsets.append(len(excluded))
+        entry_offsets.append(len(entry_classes))
+
+    class_offsets = array('I', [0])
+    all_members = array('I')
+    for members in class_members:
+        all_members.extend(members)
+        class_offsets.append(len(all_members))
+
+    return {
+        'coffsets': class_offsets,
+        'members': all_members,
+        'eoffsets': entry_offsets,
+        'eclasses': entry_classes,
+        'xoffsets': excluded_offsets,
+        'excluded': excluded,
+    }
+
+def offsets(chunks):
+    '''
+    Returns the array of offsets of back to back chunks, ending with
+    their total length
+    '''
+
+    result = array('I', [0])
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+        result.append(total)
+
+    return result
+
+def write_sections(out_file, sections):
+    '''
+    Writes the named sections to file, aligned to 8 bytes
+    '''
+
+    names = list(sections)
+    data = [sections[name] if isinstance(sections[name], bytes)
+        else sections[name].tobytes() for name in names]
+
+    # Lay out the sections after the header and section table
+    offset = HEADER.size + SECTION.size * len(names)
+    table = []
+    for name, chunk in zip(names, data):
+        offset += -offset % 8
+        table.append((name, offset, len(chunk)))
+        offset += len(chunk)
+
+    with open(out_file, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDERS[sys.byteorder], len(names)))
+        for name, offset, length in table:
+            file.write(SECTION.pack(name.encode('ascii'), offset, length))
+
+        for (name, offset, length), chunk in zip(table, data):
+            file.write(b'\0' * (offset - file.tell()))
+            file.write(chunk)
+
+class Lexicon(Mapping):
+    '''
+    Memory-mapped binary lexicon
+
+    Behaves as the stress dictionary, mapping words to (stress, complexity)
+    tuples, with the rhyming dictionary available as rhyme_dict
+    '''
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as file:
+            self.mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, byte_order, num_sections = HEADER.unpack_from(self.mm, 0)
+
+        if magic != MAGIC:
+            raise ValueError('Not a lexicon file', filename)
+        if version != VERSION:
+            raise ValueError('Unsupported lexicon version', filename, version)
+        if byte_order != BYTE_ORDERS[sys.byteorder]:
+            raise ValueError('Lexicon was written with another byte order', filename)
+
+        view = memoryview(self.mm)
+
+        self.sections = {}
+        for i in range(num_sections):
+            name, offset, length = SECTION.unpack_from(self.mm, HEADER.size + SECTION.size * i)
+            name = name.rstrip(b'\0').decode('ascii')
+
+            section = view[offset:offset + length]
+            if name in TYPECODES:
+                section = section.cast(TYPECODES[name])
+            self.sections[name] = section
+
+        self.words = self.sections['words']
+        self.woffsets = self.sections['woffsets']
+        self.stress_ids = self.sections['stress']
+        self.complexities = self.sections['complex']
+
+        # Only present in corpus bundles
+        self.corpus = self.sections.get('corpus')
+
+        # The interned stress patterns are few, so decode them up front
+        stresses = self.sections['stresses']
+        soffsets = self.sections['soffsets']
+        self.stresses = [stresses[soffsets[i]:soffsets[i + 1]].tobytes().decode('ascii')
+            for i in range(len(soffsets) - 1)]
+
+        # Words looked up so far, in both directions
+        self.id_cache = {}
+        self.word_cache = {}
+
+        self.rhyme_dict = RhymeView(self)
+
+    def __len__(self):
+        return len(self.woffsets) - 1
+
+    def word(self, index):
+        '''
+        Returns the word at the given index of the word table
+        '''
+
+        try:
+            return self.word_cache[index]
+        except KeyError:
+            word = self.words[self.woffsets[index]:self.woffsets[index + 1]].tobytes().decode('utf-8')
+            self.word_cache[index] = word
+            return word
+
+    def index(self, word):
+        '''
+        Returns the index of the word in the word table, or None if it
+        is not in the lexicon
+        '''
+
+        try:
+            return self.id_cache[word]
+        except KeyError:
+            pass
+
+        # Binary search over the sorted word table
+        # Note that UTF-8 bytes sort in the same order as the words
+        key = word.encode('utf-8')
+        words = self.words
+        woffsets = self.woffsets
+
+        lo = 0
+        hi = len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if words[woffsets[mid]:woffsets[mid + 1]].tobytes() < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        if lo < len(self) and words[woffsets[lo]:woffsets[lo + 1]].tobytes() == key:
+            index = lo
+        else:
+            index = None
+
+        self.id_cache[word] = index
+        return index
+
+    def __contains__(self, word):
+        return self.index(word) is not None
+
+    def __getitem__(self, word):
+        index = self.index(word)
+        if index is None:
+            raise KeyError(word)
+
+        return (self.stresses[self.stress_ids[index]], self.complexities[index])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.word(index)
+
+    def nsyl(self, word):
+        '''
+        Returns the number of syllables in input word
+        '''
+
+        index = self.index(word)
+        if index is None:
+            raise KeyError(word)
+
+        return self.sections['nsyl'][index]
+
+    def is_bundle(self):
+        '''
+        Returns whether the lexicon is bundled for a single corpus
+        '''
+
+        return self.corpus is not None
+
+    def corpus_words(self):
+        '''
+        Returns the list of words in the corpus of a bundle
+        '''
+
+        return [self.word(i) for i in range(len(self)) if self.corpus[i]]
+
+class RhymeView(RhymeClasses):
+    '''
+    The rhyming dictionary of a lexicon, stored as rhyme classes over
+    its word table
+
+    Maps words to new sets of their rhymes, while rhyme_set() returns a
+    RhymeSet sharing the words of the class, see RhymeClasses. There is
+    no trie, so rhymes can only be found at the level of each word.
+    '''
+
+    def __init__(self, lexicon):
+        self.lexicon = lexicon
+
+        sections = lexicon.sections
+        self.class_offsets = sections['coffsets']
+        self.members = sections['members']
+        self.entry_offsets = sections['eoffsets']
+        self.entry_classes = sections['eclasses']
+        self.excluded_offsets = sections['xoffsets']
+        self.excluded = sections['excluded']
+
+        self.class_sets = {}
+        self.trie = None
+        self.num_rhyming = None
+
+    def index(self, word):
+        return self.lexicon.index(word)
+
+    def word(self, index):
+        return self.lexicon.word(index)
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--full']
+
+    if len(args) > 0:
+        filename = args[0]
+    else:
+        filename = 'data/english.txt'
+
+    out_file = os.path.splitext(path + '/' + filename)[0] + '.lex'
+    print('Writing to %s...' % out_file)
+
+    stress_dict = pickle.load( open(path + '/data/cmudict.pkl', 'rb') )
+    rhyme_dict = load_rhyme_dict(os.path.splitext(path + '/' + filename)[0] + '.pkl')
+
+    if '--full' in sys.argv:
+        corpus = None
+    else:
+        corpus = vocabulary(path + '/' + filename, stress_dict, progress=True)
+
+    write_lexicon(out_file, stress_dict, rhyme_dict, corpus)
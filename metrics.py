@@ -0,0 +1,101 @@
+'''
+Composition Metrics
+===================
+Opt-in counters and stage timings for the Poet, to see where the
+time of a composition goes, and which forms and corpora make it
+retry and restart the most.
+
+Metrics are only gathered within Poet.measure(), and are otherwise
+skipped after a single check, so they cost close to nothing when
+they are not in use.
+
+Counters:
+---------
+    line                lines generated
+    draws               words drawn for lines
+    retry               lines retried within a poem
+    restart             poems composed again from the start
+    slant               rhymes relaxed below the strict level
+    rejected.<reason>   lines or rhymes rejected, by reason:
+                        rhyme, syllables, cadence or length
+
+Usage:
+------
+    >>> p = Poet()
+    >>> with p.measure() as metrics:
+    ...     p.string_ballade()
+    >>> metrics.export()
+'''
+
+import functools
+import time
+
+class Metrics(object):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        '''
+        Clears all counters and timings
+        '''
+
+        self.counts = {}
+
+        # Calls and total seconds of each stage
+        self.calls = {}
+        self.seconds = {}
+
+    def count(self, name, n=1):
+        '''
+        Adds n to the named counter
+        '''
+
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def time(self, stage, seconds):
+        '''
+        Adds a call of the given number of seconds to the stage
+        '''
+
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def export(self):
+        '''
+        Returns the counters and timings as a dictionary, which can be
+        written as JSON
+
+        Note that the time of a stage includes the stages it calls
+        '''
+
+        return {
+            'counts': dict(sorted(self.counts.items())),
+            'stages': {stage: {'calls': self.calls[stage], 'seconds': self.seconds[stage]}
+                for stage in sorted(self.calls)},
+        }
+
+def timed(stage):
+    '''
+    Decorates a Poet method, so that its calls are timed as the given
+    stage while the Poet is measuring
+    '''
+
+    def decorator(method):
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            metrics = getattr(self.local, 'metrics', None)
+
+            if metrics is None:
+                return method(self, *args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                metrics.time(stage, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
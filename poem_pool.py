@@ -0,0 +1,232 @@
+'''
+Poem Pool
+=========
+Ready pool of pre-composed poems for each form, refilled by a
+background thread, so that serving a poem is a pop from the pool
+rather than composing it while the caller waits.
+
+A form is refilled once it falls below the low watermark, and is
+topped up to the high watermark. The pool can be saved to a file
+when closed, and is loaded from it again on the next start.
+
+A form whose poem fails to compose is logged, and is left alone for
+a while before it is tried again, backing off further on every
+failure in a row, while the other forms keep being refilled.
+
+Usage:
+------
+    >>> p = Poet()
+    >>> p.pool = PoemPool(p, low=4, high=16, filename='data/poems.pool')
+    >>> print(p.compose_random_poem())
+    >>> p.pool.close()
+'''
+
+from collections import deque
+from concurrent.futures import CancelledError
+import logging
+import pickle
+import random
+import threading
+import time
+
+import os
+
+from budget import CompositionFailed
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before composing a form again after a failure, which
+# doubles on every failure in a row up to the maximum
+RETRY_DELAY = 0.1
+MAX_RETRY_DELAY = 30.0
+
+class PoemPool(object):
+
+    def __init__(self, poet, forms=None, low=4, high=16, filename=None, makers=None):
+        '''
+        Starts refilling a pool for the given forms, which default to all
+        forms of the Poet
+
+        Each form is composed by its maker, a function returning a poem,
+        which defaults to the string_ method of the Poet for the form
+        '''
+
+        if low > high:
+            raise ValueError('Low watermark above high watermark', low, high)
+
+        if makers is None:
+            if forms is None:
+                forms = poet.FORMS
+            makers = {form: getattr(poet, 'string_' + form) for form in forms}
+        elif forms is None:
+            forms = list(makers)
+
+        self.poet = poet
+        self.forms = list(forms)
+        self.makers = makers
+        self.low = low
+        self.high = high
+        self.filename = filename
+
+        self.poems = {form: deque() for form in self.forms}
+
+        # Forms being topped up to the high watermark
+        self.filling = set(self.forms)
+
+        # Failures in a row of each form, and when it may be tried again
+        self.failures = {form: 0 for form in self.forms}
+        self.retry_at = {form: 0.0 for form in self.forms}
+
+        if filename is not None and os.path.exists(filename):
+            self.load(filename)
+
+        # Set when a form falls below the low watermark, or on closing
+        self.wanted = threading.Event()
+        self.stopped = threading.Event()
+
+        self.thread = threading.Thread(target=self.refill, daemon=True)
+        self.thread.start()
+
+    def pop(self, form):
+        '''
+        Returns a poem of the given form, or of a random form if 'random',
+        composing it on the spot only if the pool has run dry
+        '''
+
+        if form == 'random':
+            form = random.choice(self.forms)
+        elif form not in self.poems:
+            raise ValueError('Form of poetry not in pool', form)
+
+        poems = self.poems[form]
+
+        try:
+            poem = poems.popleft()
+        except IndexError:
+            poem = self.makers[form]()
+
+        if len(poems) < self.low:
+            self.wanted.set()
+
+        return poem
+
+    def neediest(self):
+        '''
+        Returns the form with the fewest poems among those that need
+        refilling, or None if all of them are full or backing off after
+        a failure
+        '''
+
+        now = time.monotonic()
+        needy = []
+
+        for form in self.forms:
+            num_poems = len(self.poems[form])
+
+            if num_poems < self.low:
+                self.filling.add(form)
+            elif num_poems >= self.high:
+                self.filling.discard(form)
+
+            if form in self.filling and self.retry_at[form] <= now:
+                needy.append((num_poems, form))
+
+        if len(needy) == 0:
+            return None
+
+        return min(needy)[1]
+
+    def refill(self):
+        '''
+        Composes poems for the forms below their watermarks, and waits for
+        a form to fall below the low watermark once all are full, or for
+        the next form backing off to be tried again
+        '''
+
+        while not self.stopped.is_set():
+            form = self.neediest()
+
+            if form is None:
+                self.wanted.wait(self.retry_delay())
+                self.wanted.clear()
+                continue
+
+            # Stop the poem in progress once the pool is closed
+            try:
+                with self.poet.budget(cancel=self.stopped):
+                    poem = self.makers[form]()
+            except CancelledError:
+                break
+            except CompositionFailed as e:
+                # An unlucky poem, so only log the reason
+                logger.warning('Could not compose a %s for the pool, retrying in %.1fs: %s', 
+                    form, self.back_off(form), e)
+                continue
+            except Exception:
+                logger.exception('Failed to compose a %s for the pool, retrying in %.1fs', 
+                    form, self.back_off(form))
+                continue
+
+            self.failures[form] = 0
+            self.poems[form].append(poem)
+
+    def back_off(self, form):
+        '''
+        Counts a failure of the form in a row, and returns the seconds to
+        wait before it is tried again
+        '''
+
+        self.failures[form] += 1
+        delay = min(RETRY_DELAY * 2 ** (self.failures[form] - 1), MAX_RETRY_DELAY)
+        self.retry_at[form] = time.monotonic() + delay
+
+        return delay
+
+    def retry_delay(self):
+        '''
+        Returns the seconds until the next form needing a refill may be
+        tried again after a failure, or None if there is none
+        '''
+
+        waiting = [self.retry_at[form] for form in self.filling if self.failures[form] > 0]
+
+        if len(waiting) == 0:
+            return None
+
+        return max(min(waiting) - time.monotonic(), 0)
+
+    def load(self, filename):
+        '''
+        Loads the poems saved by save(), for the forms of the pool
+        '''
+
+        saved = pickle.load( open(filename, 'rb') )
+
+        for form in self.forms:
+            self.poems[form].extend(saved.get(form, [])[:self.high])
+
+    def save(self, filename):
+        '''
+        Saves the poems in the pool to file
+        '''
+
+        poems = {form: list(self.poems[form]) for form in self.forms}
+        pickle.dump(poems, open(filename, 'wb'))
+
+    def close(self):
+        '''
+        Stops refilling the pool, and saves it if it has a file
+        '''
+
+        self.stopped.set()
+        self.wanted.set()
+        self.thread.join()
+
+        if self.filename is not None:
+            self.save(self.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -34,35 +34,120 @@ Usage:
 
 import pickle
 
+import asyncio
+import bisect
+import contextlib
 import re
 import random
+import threading
 import time
+import warnings
+
+from concurrent.futures import ThreadPoolExecutor
 
 import os
 import sys
 
+# BudgetExceeded and CompositionFailed are re-exported, so that callers
+# can catch them with 'from poetry import Poet, BudgetExceeded'
+from budget import Budget, BudgetExceeded, CompositionFailed  # noqa: F401
+from corpus import vocabulary
+from lexicon import Lexicon
+from metrics import Metrics, timed
+from rhyme_set import RhymeSet, load_rhyme_dict
+from solver import LineSolver
+
 # Get the py-verse directory
 path = os.path.abspath(os.path.dirname(sys.argv[0]))
 
 class Poet(object):
 
-    def __init__(self, filename=None):
+    # Available composition engines, see solver.py
+    ENGINES = ('random', 'solver')
+
+    # Available forms of poetry, each composed by its string_ method
+    FORMS = ('love_poem', 'haiku', 'doublet', 'limerick', 'sonnet', 
+        'quatrain', 'villanelle', 'ballade')
 
-        # Import the CMU dictionary of pronunciation and stress
-        self.dict = pickle.load( open(path + '/data/cmudict.pkl', 'rb') ) 
+    # Number of poems composed at once by acompose()
+    MAX_CONCURRENT = 4
+
+    def __init__(self, filename=None, engine='random', slant_level=None):
 
-        # Load the word list from the input corpus
         if not filename:
-            self.word_list = self.load(path + '/data/english.txt')
+            filename = path + '/data/english.txt'
+
+        # Prefer the memory-mapped binary lexicon of the corpus, if compiled
+        lexicon_file = os.path.splitext(filename)[0] + '.lex'
+
+        lexicon = None
+
+        if os.path.exists(lexicon_file):
+            lexicon = Lexicon(lexicon_file)
+            self.dict = lexicon
+            self.rhyme_dict = lexicon.rhyme_dict
+
+        else:
+            # Import the CMU dictionary of pronunciation and stress
+            self.dict = pickle.load( open(path + '/data/cmudict.pkl', 'rb') ) 
+
+            # Try to find the rhyming dictionary file
+            # If it does not exist, default to the 10,000 most common words from Google
+            try:
+                self.rhyme_dict = load_rhyme_dict(os.path.splitext(filename)[0] + '.pkl')
+            except:
+                self.rhyme_dict = load_rhyme_dict(path + '/data/english.pkl')
+
+        # Load the word list from the input corpus, unless it is bundled
+        if lexicon is not None and lexicon.is_bundle():
+            self.word_list = lexicon.corpus_words()
         else:
             self.word_list = self.load(filename)
 
-        # Try to find the rhyming dictionary file
-        # If it does not exist, default to the 10,000 most common words from Google
-        try:
-            self.rhyme_dict = pickle.load( open(os.path.splitext(filename)[0] + '.pkl', 'rb') )
-        except:
-            self.rhyme_dict = pickle.load( open(path + '/data/english.pkl', 'rb') )
+        # Compiled cadence patterns, see cadence_match()
+        self.cadence_cache = {}
+
+        # Group the words by syllables and stress to fill lines without rejection
+        self.index_syllables()
+        self.index_stresses()
+
+        # Select the engine for rhymed and metered lines
+        if engine not in self.ENGINES:
+            raise ValueError('Unknown composition engine', engine)
+
+        self.engine = engine
+        self.solver = LineSolver(self)
+
+        # Words with rhymes, listed on first use, see rhyme_words()
+        self.rhyme_list = None
+
+        # Immutable rhyme sets, built on first use, see rhymes()
+        self.rhyme_sets = {}
+
+        # Lowest rhyme level to fall back on once the strict rhymes of a
+        # word run out, or None for strict rhymes only, see rhyme()
+        if slant_level is not None and slant_level < 1:
+            raise ValueError('Slant rhyme level below 1', slant_level)
+
+        self.slant_level = slant_level
+        self.slant_sets = {}
+        self.loose_sets = {}
+
+        # Slant rhymes are found in the trie, which bundled lexicons and
+        # rhyming dictionaries compiled without it lack
+        if slant_level is not None and getattr(self.rhyme_dict, 'trie', None) is None:
+            warnings.warn('The rhyming dictionary has no trie, so slant_level is ignored; '
+                'compile it again with rhyme_dict.py to use slant rhymes')
+
+        # Threads composing for acompose(), started on first use
+        self.executor = None
+
+        # Budget and metrics of the poem composed by each thread, see
+        # budget() and measure()
+        self.local = threading.local()
+
+        # Pool of pre-composed poems to serve from, see poem_pool.py
+        self.pool = None
 
 
     ##############
@@ -84,15 +169,148 @@ class Poet(object):
     def compose_random_poem(self):
         '''
         Composes a random poem from the available forms of poetry.
+
+        If a PoemPool is attached as pool, the poem is served from it.
+        '''
+
+        if self.pool is not None:
+            return self.pool.pop('random')
+
+        return self.compose('random')
+
+    def compose(self, form):
+        '''
+        Composes and formats a poem of the given form, which is one of
+        FORMS, or 'random' for a random form
+        '''
+
+        if form == 'random':
+            form = random.choice(self.FORMS)
+        elif form not in self.FORMS:
+            raise ValueError('Unknown form of poetry', form)
+
+        return getattr(self, 'string_' + form)()
+
+    async def acompose(self, form, timeout=None, attempts=None):
+        '''
+        Composes a poem of the given form without blocking the event loop
+
+        The poem is composed on one of MAX_CONCURRENT threads, and further
+        requests wait for a free thread. If the timeout passes or the task
+        is cancelled, the composition is stopped at its next retry.
+
+        If given a number of attempts, the composition fails with
+        BudgetExceeded once it has made that many, see budget()
         '''
-        
-        poetry_methods = [self.string_love_poem, self.string_haiku, self.string_doublet, 
-        self.string_limerick, self.string_sonnet, self.string_quatrain, 
-        self.string_villanelle, self.string_ballade]
 
-        random_poem = random.choice(poetry_methods)
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.MAX_CONCURRENT)
+
+        cancel = threading.Event()
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, self.compose_cancellable, form, cancel, attempts)
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            cancel.set()
+
+    def compose_cancellable(self, form, cancel, attempts=None):
+        '''
+        Composes a poem of the given form, which is stopped with a
+        CancelledError at the next retry once the cancel event is set
+        '''
+
+        with self.budget(attempts=attempts, cancel=cancel):
+            return self.compose(form)
+
+    @contextlib.contextmanager
+    def budget(self, seconds=None, attempts=None, cancel=None):
+        '''
+        Limits the compositions of this thread within the block to a
+        number of seconds and of attempts, after which they fail with 
+        BudgetExceeded, see budget.py
+
+        Yields the Budget, which counts the attempts made
+        '''
+
+        budget = Budget(seconds, attempts, cancel)
+
+        previous = getattr(self.local, 'budget', None)
+        self.local.budget = budget
+
+        try:
+            yield budget
+        finally:
+            self.local.budget = previous
+
+    def checkpoint(self, event='retry'):
+        '''
+        Counts an attempt against the budget of the composition, and
+        stops it if the budget has run out or it has been cancelled
+
+        Called for every line and on every retry, so that no retry
+        loop can run away. The event is counted in the metrics as a
+        'line', a 'retry' of a line, or a 'restart' of the poem.
+        '''
+
+        budget = getattr(self.local, 'budget', None)
+
+        if budget is not None:
+            budget.spend(event != 'line')
+
+        self.record(event)
+
+    @contextlib.contextmanager
+    def measure(self, metrics=None):
+        '''
+        Gathers the metrics of the compositions of this thread within
+        the block, see metrics.py
+
+        Yields the Metrics, which may also be given, to add up the
+        metrics of several blocks
+        '''
+
+        if metrics is None:
+            metrics = Metrics()
+
+        previous = getattr(self.local, 'metrics', None)
+        self.local.metrics = metrics
+
+        try:
+            yield metrics
+        finally:
+            self.local.metrics = previous
+
+    def record(self, name, n=1):
+        '''
+        Adds n to the named counter of the metrics, if measuring
+        '''
 
-        return random_poem()
+        metrics = getattr(self.local, 'metrics', None)
+
+        if metrics is not None:
+            metrics.count(name, n)
+
+    def record_line(self, line, max_chars=None):
+        '''
+        Counts the words drawn for a line, and whether the line was cut
+        off for its cadence or its budget of characters, if measuring
+
+        Returns the line
+        '''
+
+        metrics = getattr(self.local, 'metrics', None)
+
+        if metrics is not None:
+            if None in line:
+                metrics.count('draws', len(line) - 1)
+                metrics.count('rejected.cadence' if max_chars is None else 'rejected.length')
+            else:
+                metrics.count('draws', len(line))
+
+        return line
 
     def print_love_poem(self):
         '''
@@ -113,6 +331,7 @@ class Poet(object):
 
         # Keep generating until there is valid line
         while love_poem[-1] is None:
+            self.checkpoint('restart')
             love_poem = self.compose_love_poem()
 
         final_poem = self.format_poem(love_poem, title='A Nonsense Love Poem')
@@ -157,6 +376,7 @@ class Poet(object):
 
         # Keep looking for valid doublets
         while doublet[-1] is None:
+            self.checkpoint('restart')
             doublet = self.compose_doublet()
 
         final_poem = self.format_poem(doublet, title='A Nonsense Doublet')
@@ -183,6 +403,7 @@ class Poet(object):
         limerick = self.compose_limerick()
 
         while None in limerick:
+            self.checkpoint('restart')
             limerick = self.compose_limerick()
 
         final_poem = self.format_poem(limerick, title='A Nonsense Limerick')
@@ -209,6 +430,7 @@ class Poet(object):
         sonnet = self.compose_sonnet()
 
         while None in sonnet:
+            self.checkpoint('restart')
             sonnet = self.compose_sonnet()
 
         title = self.generate_title(sonnet)
@@ -248,6 +470,7 @@ class Poet(object):
         quatrain = self.compose_quatrain()
 
         while None in quatrain:
+            self.checkpoint('restart')
             quatrain = self.compose_quatrain()
 
         final_poem = self.format_poem(quatrain, title='A Nonsense Quatrain')
@@ -274,6 +497,7 @@ class Poet(object):
         villanelle = self.compose_villanelle()
 
         while None in villanelle:
+            self.checkpoint('restart')
             villanelle = self.compose_villanelle()
 
         end = time.time()
@@ -317,6 +541,7 @@ class Poet(object):
         ballade = self.compose_ballade()
 
         while None in ballade:
+            self.checkpoint('restart')
             ballade = self.compose_ballade()
 
         title = self.generate_title(ballade)
@@ -417,22 +642,16 @@ class Poet(object):
     ### Corpus Loading ###
     ######################
 
-    def load(self, filename):
+    def load(self, filename, progress=False):
         '''
         Load in a corpus of text and extract all unique occurrences
         of words that are in the CMU dictionary
-        '''
-
-        word_list = set()
 
-        file = open(filename)
-        raw_text = file.read().split()
-        for word in raw_text:
-            clean_word = self.sanitize(word)
-            if clean_word in self.dict:
-                word_list.update([clean_word])
+        The corpus is streamed in chunks, see corpus.py, and the words
+        are sorted so that the word list does not depend on hashing
+        '''
 
-        return list(word_list)
+        return sorted(vocabulary(filename, self.dict, progress=progress))
 
     ###############
     ### Cadence ###
@@ -491,7 +710,7 @@ class Poet(object):
 
     def cadence_match(self, cad, pattern, reverse=False):
         '''
-        Recursively traverses both patterns to match
+        Traverses both patterns to match
 
         By default, the matching is done in the forward 
         direction, so returns true if the input cadence 
@@ -500,165 +719,539 @@ class Poet(object):
         The reverse flag will match the input cadence from the 
         end of the pattern in reverse, so returns true if the
         input cadence matches the END of the pattern
+
+        Each pattern is compiled into a table of the cadences checked
+        against it, so every (cadence, pattern) pair is only matched once
         '''
 
-        # Base cases: empty strings
-        if len(cad) == 0:
-            return True
-        elif len(pattern) == 0:
+        try:
+            matches = self.cadence_cache[pattern, reverse]
+        except KeyError:
+            matches = self.cadence_cache[pattern, reverse] = {}
+
+        try:
+            return matches[cad]
+        except KeyError:
+            pass
+
+        # A cadence longer than the pattern cannot match
+        if len(cad) > len(pattern):
+            matches[cad] = False
             return False
 
-        # Recursive case
+        # Line up the cadence with the start or the end of the pattern
+        if reverse:
+            offset = len(pattern) - len(cad)
+        else:
+            offset = 0
+
         # Note: Patterns match if stresses match exactly, or the pattern is indeterminate
         # and the input cadence has no stress. We do not want a stressed syllable matching 
         # an indeterminate syllable. 
-        else:
-            if reverse:
-                if cad[-1] == pattern[-1] or cad[-1] == '0' and pattern[-1] == '*':
-                    return self.cadence_match(cad[:-1], pattern[:-1], reverse=True)
-                else:
-                    return False
+        match = True
+        for i in range(len(cad)):
+            stress = cad[i]
+            expected = pattern[offset + i]
+            if stress != expected and not (stress == '0' and expected == '*'):
+                match = False
+                break
+
+        matches[cad] = match
+        return match
+
+    def index_syllables(self):
+        '''
+        Sorts the words in the corpus by number of syllables, so that
+        the words of at most n syllables are the first cum_syllables[n]
+        words of the sorted list
+
+        Words with too many phonemes are left out, as in index_stresses()
+        '''
+
+        words = []
+        for word in self.word_list:
+            num_syl = self.nsyl(word)
+            if num_syl > 0 and self.complexity(word) <= 3:
+                words.append((num_syl, word))
+        words.sort()
+
+        self.syllable_words = [word for _, word in words]
+        self.syllable_counts = [num_syl for num_syl, _ in words]
+
+        # Cumulative number of words with at most n syllables
+        max_syl = self.syllable_counts[-1] if len(words) > 0 else 0
+        self.cum_syllables = [bisect.bisect_right(self.syllable_counts, n) 
+            for n in range(max_syl + 1)]
+
+    def random_syllable_index(self, num_syl):
+        '''
+        Returns the index in syllable_words of a random word with at most
+        the given number of syllables
+        '''
+
+        num_fitting = self.cum_syllables[min(num_syl, len(self.cum_syllables) - 1)]
+
+        if num_fitting == 0:
+            raise ValueError('No words in corpus with at most %d syllables' % num_syl)
+
+        return random.randrange(num_fitting)
+
+    def index_stresses(self):
+        '''
+        Groups the words in the corpus into buckets by stress pattern
+
+        Words with too many phonemes do not flow well, so they are
+        left out of the buckets altogether
+        '''
+
+        self.stress_index = {}
+
+        for word in self.word_list:
+            if self.complexity(word) > 2.5:
+                continue
+
+            stress = self.stress(word)
+
+            # Some words have no syllables
+            if len(stress) == 0:
+                continue
+
+            if stress in self.stress_index:
+                self.stress_index[stress].append(word)
             else:
-                if cad[0] == pattern[0] or cad[0] == '0' and pattern[0] == '*':
-                    return self.cadence_match(cad[1:], pattern[1:])
-                else:
-                    return False
+                self.stress_index[stress] = [word]
+
+        # Stress buckets fitting each pattern, filled in as patterns come up
+        self.stress_cache = {}
+
+    def stress_buckets(self, pattern):
+        '''
+        Returns the stress buckets whose stress matches the start of the
+        pattern, along with the cumulative number of words in them
+        '''
+
+        if pattern in self.stress_cache:
+            return self.stress_cache[pattern]
+
+        buckets = []
+        cum_weights = []
+        total = 0
+
+        for stress in sorted(self.stress_index):
+            if self.cadence_match(stress, pattern):
+                total += len(self.stress_index[stress])
+                buckets.append(self.stress_index[stress])
+                cum_weights.append(total)
+
+        self.stress_cache[pattern] = (buckets, cum_weights)
+        return buckets, cum_weights
+
+    def random_stress_word(self, pattern):
+        '''
+        Returns a random word whose stress matches the start of the
+        pattern, or None if no word fits
+        '''
+
+        buckets, cum_weights = self.stress_buckets(pattern)
+
+        if len(buckets) == 0:
+            return None
+
+        # Every fitting word is equally likely
+        index = random.randrange(cum_weights[-1])
+        bucket = bisect.bisect_right(cum_weights, index)
+        if bucket > 0:
+            index -= cum_weights[bucket - 1]
+
+        return buckets[bucket][index]
 
 
     ###############
     ### Rhyming ###
     ###############
 
-    def rhyme_set(self, input_word, restricted=set()):
+    def rhymes(self, input_word, level=None):
+        '''
+        Returns the immutable RhymeSet of the input word, or None if it
+        has no rhymes
+
+        If given a level, the rhymes at that level are found in the trie
+        of the rhyming dictionary instead, if it was compiled with one
+
+        The rhyme sets are shared by all poems, and must not be modified.
+        Those of a rhyming dictionary of rhyme classes share the words of
+        their class.
+        '''
+
+        if level is not None:
+            return self.slant_rhymes(input_word, level)
+
+        try:
+            return self.rhyme_sets[input_word]
+        except KeyError:
+            pass
+
+        if hasattr(self.rhyme_dict, 'rhyme_set'):
+            rhymes = self.rhyme_dict.rhyme_set(input_word)
+        elif input_word in self.rhyme_dict:
+            rhymes = RhymeSet(self.rhyme_dict[input_word])
+        else:
+            rhymes = None
+
+        self.rhyme_sets[input_word] = rhymes
+        return rhymes
+
+    def slant_rhymes(self, input_word, level):
+        '''
+        Returns the immutable RhymeSet of the input word at the given
+        level, or None if it has none or there is no trie to find them
+        '''
+
+        key = (input_word, level)
+
+        try:
+            return self.slant_sets[key]
+        except KeyError:
+            pass
+
+        if hasattr(self.rhyme_dict, 'rhymes_at'):
+            rhymes = self.rhyme_dict.rhymes_at(input_word, level)
+        else:
+            rhymes = None
+
+        self.slant_sets[key] = rhymes
+        return rhymes
+
+    def loose_rhymes(self, input_word):
+        '''
+        Returns the immutable RhymeSet of the rhymes the input word may
+        end up with, counting slant rhymes down to the slant level of the
+        Poet, or None if it has none
+
+        Used to work out whether a form can be composed, since rhyme()
+        falls back on the slant rhymes once the strict ones run out
+        '''
+
+        levels = self.slant_levels(input_word)
+        if len(levels) == 0:
+            return self.rhymes(input_word)
+
+        try:
+            return self.loose_sets[input_word]
+        except KeyError:
+            pass
+
+        # Rhymes at a lower level take in those at higher levels, but
+        # for the very same pronunciations, so the slant rhymes, which
+        # share the words of their tail (see RhymeTrie.rhyme_set()), are
+        # nearly always returned as they are
+        rhymes = self.rhymes(input_word)
+        slant = self.slant_rhymes(input_word, levels[-1])
+
+        if slant is None:
+            loose = rhymes
+        elif rhymes is None or all(rhyme_word in slant for rhyme_word in rhymes):
+            loose = slant
+        else:
+            loose = RhymeSet(set(rhymes).union(slant))
+
+        self.loose_sets[input_word] = loose
+        return loose
+
+    def slant_levels(self, input_word):
+        '''
+        Returns the levels below the strict rhyme level of the input word
+        to fall back on, down to the slant level of the Poet
+        '''
+
+        if self.slant_level is None or not hasattr(self.rhyme_dict, 'rhyme_level'):
+            return range(0)
+
+        level = self.rhyme_dict.rhyme_level(input_word)
+        if level is None:
+            return range(0)
+
+        return range(level - 1, self.slant_level - 1, -1)
+
+    def rhyme_set(self, input_word, restricted=set(), level=None):
         '''
         Returns the set of all words that rhyme with the 
         input word, encompassing all possible pronunciations
-        '''
 
-        if input_word not in self.rhyme_dict:
-            return None
+        The set is a new one, without the restricted words
+        '''
 
-        # Get the rhymes from the pre-compiled dictionary
-        rhyming_set = self.rhyme_dict[input_word]
+        rhymes = self.rhymes(input_word, level)
 
-        # Remove the restricted set
-        rhyming_set.difference_update(restricted)
+        if rhymes is None:
+            return None
 
-        return rhyming_set
+        return rhymes.without(restricted)
 
-    def rhyme(self, input_word, min_rhymes=1, restricted=set()):
+    def rhyme(self, input_word, min_rhymes=1, restricted=set(), level=None):
         '''
         Given word, returns random rhyming word, or None if none exists
+
+        Once the strict rhymes run out, slant rhymes are drawn instead at
+        the highest level with enough of them, down to the slant level of
+        the Poet, if any. Given a level, only rhymes at that level are.
         '''
 
         if input_word.lower() not in self.dict:
             return None
 
-        rhymes = self.rhyme_set(input_word, restricted)
+        rhymes = self.rhymes(input_word, level)
 
-        if rhymes is None:
-            return None
+        if rhymes is not None and rhymes.count(restricted) >= min_rhymes:
+            return rhymes.sample(restricted)
 
-        if len(rhymes) < min_rhymes:
+        if level is not None:
             return None
 
-        return random.sample(rhymes, 1)[0]
+        # Relax the rhyme one phoneme at a time
+        for slant_level in self.slant_levels(input_word):
+            rhymes = self.slant_rhymes(input_word, slant_level)
+
+            if rhymes is not None and rhymes.count(restricted) >= min_rhymes:
+                self.record('slant')
+                return rhymes.sample(restricted)
+
+        return None
+
+    def rhyme_words(self):
+        '''
+        Returns the list of all words with rhymes, which is only built 
+        once rather than for every poem
+        '''
+
+        if self.rhyme_list is None:
+            self.rhyme_list = sorted(self.rhyme_dict.keys())
+
+        return self.rhyme_list
+
+    def enough_rhymes(self, line, min_rhymes=1, pattern=None, restricted=set()):
+        '''
+        Returns whether the last word of the line has enough rhymes to end
+        the given number of further lines
+
+        Only the rhymes that can end a line on the pattern are counted,
+        see LineSolver.usable_rhymes(), including slant rhymes down to the
+        slant level of the Poet. The pattern defaults to the cadence of
+        the line itself.
+        '''
+
+        last_word = line[-1]
+
+        # The line may have been cut off
+        if last_word is None:
+            return False
+
+        if pattern is None:
+            pattern = self.cadence(' '.join(line))
+
+        rhymes = self.solver.usable_rhymes(pattern, last_word, restricted, slant=True)
+        return len(rhymes) >= min_rhymes
 
 
     #######################
     ### Line Generation ###
     #######################
 
-    def generate_line(self, num_syl):
+    def line_budget(self, max_chars, lines, sizes):
         '''
-        Recursively generates a line with given number of syllables
+        Returns the number of characters the next line of a poem may take,
+        or None if the poem has no budget of characters
+
+        Given the lines composed so far, the characters left over are
+        shared among the lines still to come in proportion to their
+        syllables, listed in sizes starting with the next line
         '''
 
-        # Base case: zero syllables
-        if num_syl == 0:
-            return []
+        if max_chars is None:
+            return None
 
-        # Recursive case
-        else:
-            word = random.choice(self.word_list)
+        # Every line but the last is followed by a newline
+        left = max_chars + 1
+        for line in lines:
+            if line is not None:
+                left -= len(' '.join(word for word in line if word is not None)) + 1
 
-            # Randomly get a word of the correct length and low phoneme complexity
-            while self.nsyl(word) > num_syl or self.complexity(word) > 3:
-                word = random.choice(self.word_list)
+        return left * sizes[0] // sum(sizes) - 1
+
+    @timed('line')
+    def generate_line(self, num_syl, max_chars=None):
+        '''
+        Generates a line with given number of syllables
 
-            return [word] + self.generate_line(num_syl - self.nsyl(word))
+        Each word is drawn directly from the words that fit the
+        remaining syllables, see random_syllable_index()
 
-    def generate_stress_line(self, pattern, num_tries=500):
+        If given a budget of characters, the words are drawn from those
+        short enough to leave room for the rest of the line instead,
+        see LineSolver.generate_line()
+        '''
+
+        self.checkpoint('line')
+
+        if max_chars is not None:
+            return self.record_line(self.solver.generate_line(num_syl, max_chars), max_chars)
+
+        line = []
+
+        while num_syl > 0:
+            index = self.random_syllable_index(num_syl)
+
+            line.append(self.syllable_words[index])
+            num_syl -= self.syllable_counts[index]
+
+        return self.record_line(line)
+
+    @timed('stress_line')
+    def generate_stress_line(self, pattern, num_tries=500, max_chars=None):
         '''
         Generate a line matching a given pattern
 
-        Given that this is a stochastic process, we specify a number of
-        attempts to find a matching word to fit the pattern
+        Each word is drawn from the stress buckets that fit the start of
+        the remaining pattern, so every draw is a matching word. The
+        num_tries argument is kept for compatibility, as there are no
+        longer any rejected draws to count.
 
-        If the number of tries is exceeded, the function cuts and returns
-        a None where it cut off
+        If no word fits the remaining pattern, the function cuts and
+        returns a None where it cut off
 
         Note that patterns should not end in '1', as there are no one
         syllable words with primary stress
+
+        Lines with a budget of characters are always left to the solver
         '''
 
-        # Base case: no pattern
-        if len(pattern) == 0:
-            return []
+        self.checkpoint('line')
+
+        if self.engine == 'solver' or max_chars is not None:
+            return self.record_line(self.solver.generate_stress_line(pattern, max_chars), max_chars)
 
-        # Recursive case
+        # Copy the pattern and operate on the copy
+        if len(pattern) > 0 and pattern[-1] == '1':
+            pattern_copy = pattern[:-1] + '*'
         else:
-            # Copy the pattern and operate on the copy
-            if pattern[-1] == '1':
-                pattern_copy = pattern[:][:-1] + '*'
-            else:
-                pattern_copy = pattern[:]
+            pattern_copy = pattern[:]
+
+        line = []
 
-            word = random.choice(self.word_list)
+        while len(pattern_copy) > 0:
+            word = self.random_stress_word(pattern_copy)
 
-            # Try to find a matching word through random retrieval
-            tries = 0
-            while not self.cadence_match(self.stress(word), pattern_copy):
-                word = random.choice(self.word_list)
+            # No word fits, so the cadence is impossible to match
+            if word is None:
+                return self.record_line(line + [None])
 
-                # Words with too many phonemes do not flow well
-                while self.complexity(word) > 2.5:
-                    word = random.choice(self.word_list)
+            line.append(word)
+            pattern_copy = pattern_copy[self.nsyl(word):]
 
-                tries += 1
+        return self.record_line(line)
 
-                # Stop if number of attempts is exceeded
-                # This implies that the cadence is impossible to match
-                if tries > num_tries:
-                    return [None]
+    @timed('seed_line')
+    def generate_seed_line(self, num_syl, min_rhymes=1, num_tries=10, max_chars=None, num_seeds=100):
+        '''
+        Generates a line with given number of syllables, whose last word
+        has enough rhymes to end min_rhymes further lines on its cadence
+
+        The line is built backwards from a word known to have enough
+        rhymes of the right length. Whether they fit depends on the rest
+        of the line, so the rest is redrawn up to num_tries times before
+        moving on to another word. After num_seeds words, the line is
+        taken to be infeasible, and CompositionFailed is raised.
+
+        If given a budget of characters, only the words that leave room
+        for the rest of the line are used, and [None] is returned if no
+        word does.
+        '''
+
+        seeds = self.solver.syllable_seeds(num_syl, min_rhymes)
+
+        if len(seeds) == 0:
+            raise CompositionFailed('No words in corpus with enough rhymes', num_syl, min_rhymes)
+
+        if max_chars is not None:
+            seeds = self.solver.short_syllable_seeds(num_syl, min_rhymes, max_chars)
+
+            if len(seeds) == 0:
+                self.record('rejected.length')
+                return [None]
+
+        for _ in range(num_seeds):
+            self.checkpoint()
+            word = random.choice(seeds)
+
+            rest_chars = None
+            if max_chars is not None:
+                rest_chars = max_chars - len(word) - 1
+
+            for _ in range(num_tries):
+                line = self.generate_line(num_syl - self.nsyl(word), rest_chars)
+                line.append(word)
+
+                if self.enough_rhymes(line, min_rhymes):
+                    return line
+
+                self.record('rejected.rhyme')
+
+        raise CompositionFailed('No seed line with enough rhymes', num_syl, min_rhymes)
+
+    @timed('seed_stress_line')
+    def generate_seed_stress_line(self, pattern, min_rhymes=1, restricted=set(), max_chars=None):
+        '''
+        Generates a line matching a given pattern, whose last word has
+        enough rhymes outside the restricted set to end min_rhymes 
+        further lines on the pattern
+
+        The line is built backwards from a word known to be a feasible
+        rhyme seed, see LineSolver.seed_words()
 
-            return [word] + self.generate_stress_line(pattern_copy[self.nsyl(word):])
+        If given a budget of characters, [None] is returned if no seed
+        leaves room for the rest of the line
+        '''
+
+        line = self.solver.generate_seed_stress_line(pattern, min_rhymes, restricted, max_chars)
+
+        if line is None:
+            if max_chars is not None and len(self.solver.seed_words(pattern, min_rhymes)) > 0:
+                self.record('rejected.length')
+                return [None]
+
+            raise CompositionFailed('No words in corpus with enough rhymes', pattern, min_rhymes)
+
+        return self.record_line(line, max_chars)
 
+    @timed('rhyming_line')
     def generate_rhyming_line(self, num_syl, last_word, num_tries=10, restricted=set()):
         '''
         Generates a line that rhymes with given word
 
-        Again, this is a stochastic process, so we specify the maximum number
-        of attempts to make.
+        The rhyme is drawn from those short enough for the line, falling
+        back on slant rhymes as the feasibility checks count them, see
+        LineSolver.syllable_rhymes(). The num_tries argument is kept for
+        compatibility, as there are no longer any rejected rhymes to count.
 
         This is a more robust line generator than generate_stress_line, as 
         rhymes are more easy to come by.
         '''
 
-        for _ in range(num_tries):
+        rhymes = self.solver.syllable_rhymes(num_syl, last_word, restricted)
+        if len(rhymes) == 0:
+            self.record('rejected.rhyme')
+            return None
 
-            # Get a rhyming word
-            rhyme_word = self.rhyme(last_word, restricted=restricted)
-            if rhyme_word == None or self.nsyl(rhyme_word) > num_syl:
-                continue
+        rhyme_word = random.choice(rhymes)
 
-            # Generate the rest of the words
-            last_line = self.generate_line(num_syl - self.nsyl(rhyme_word))
-            last_line.append(rhyme_word)
+        # Generate the rest of the words
+        last_line = self.generate_line(num_syl - self.nsyl(rhyme_word))
+        last_line.append(rhyme_word)
 
-            return last_line
+        return last_line
 
-    def generate_matching_line(self, pattern, last_word, num_tries=10, restricted=set()):
+    @timed('matching_line')
+    def generate_matching_line(self, pattern, last_word, num_tries=10, restricted=set(), max_chars=None):
         '''
         Generates a line that rhymes with given word and matches the given
         cadence pattern
@@ -668,38 +1261,72 @@ class Poet(object):
 
         To increase the reliability, the rhyme does not have to match
         the ending cadence.
+
+        The solver engine instead returns None only if no such line exists,
+        and is always used for lines with a budget of characters.
         '''
 
-        # Copy the pattern and perform operations on the copy
-        pattern_copy = pattern[:]
+        self.checkpoint('line')
 
-        for _ in range(num_tries):
+        if self.engine == 'solver' or max_chars is not None:
+            line = self.solver.generate_matching_line(pattern, last_word, restricted, max_chars)
 
-            # Get a valid rhyme
-            rhyme_word = self.rhyme(last_word, restricted=restricted)
-            if rhyme_word == None or self.nsyl(rhyme_word) > len(pattern):
-                continue
+            if line is None:
+                self.record('rejected.rhyme' if max_chars is None else 'rejected.length')
+            else:
+                self.record_line(line, max_chars)
+
+            return line
+
+        # Draw from the rhymes that can end the pattern, falling back on
+        # slant rhymes as the feasibility checks count them
+        rhymes = self.solver.fitting_rhymes(pattern, last_word, 1, restricted)
+        if len(rhymes) == 0:
+            self.record('rejected.rhyme')
+            return None
+
+        for _ in range(num_tries):
+            rhyme_word = random.choice(rhymes)
 
             # Generate the rest of the line
-            last_line = self.generate_stress_line(pattern_copy[:-self.nsyl(rhyme_word)])
+            last_line = self.generate_stress_line(pattern[:-self.nsyl(rhyme_word)])
             last_line.append(rhyme_word)
 
             # generate_stress_line may return a line that cut off before finishing
             # which results in a None at the end of the list
-            if None in last_line:
-                return None
-            else:
+            if None not in last_line:
                 return last_line
 
-    def generate_multi_line(self, pattern, last_word, num_lines):
+            self.record('rejected.cadence')
+
+        return None
+
+    @timed('multi_line')
+    def generate_multi_line(self, pattern, last_word, num_lines, max_chars=None):
         '''
         Generates the specified number of matching lines
 
         Note that this might take a long time, especially with many lines
+
+        The solver engine instead returns None at once if the lines
+        cannot be generated, and is always used for lines with a budget
+        of characters, which applies to each line.
         '''
 
-        # Check if last_word has enough rhymes
-        if self.rhyme(last_word, min_rhymes=num_lines) is None:
+        if self.engine == 'solver' or max_chars is not None:
+            lines = self.solver.generate_multi_line(pattern, last_word, num_lines, max_chars)
+
+            if lines is None:
+                self.record('rejected.rhyme' if max_chars is None else 'rejected.length')
+            else:
+                for line in lines:
+                    self.record_line(line, max_chars)
+
+            return lines
+
+        # Check if last_word has enough rhymes that can end the pattern
+        if len(self.solver.usable_rhymes(pattern, last_word, slant=True)) < num_lines:
+            self.record('rejected.rhyme')
             return None
 
         lines = []
@@ -713,6 +1340,7 @@ class Poet(object):
 
             # Need valid line to add
             while line_to_add is None:
+                self.checkpoint()
                 line_to_add = self.generate_matching_line(pattern, last_word, 
                     restricted=restricted_rhymes)
 
@@ -727,7 +1355,8 @@ class Poet(object):
     ### Poetry ###
     ##############
 
-    def compose_love_poem(self):
+    @timed('compose_love_poem')
+    def compose_love_poem(self, max_chars=None):
         '''
         Generates a love poem, with the first two lines being 
         
@@ -740,6 +1369,10 @@ class Poet(object):
 
         Note that the last line may return None, in the event that
         a rhyming line cannot be generated with such a short cadence
+
+        If given a budget of characters, the poem is composed to fit 
+        it when printed, see line_budget(). The last line is None if
+        the poem does not fit.
         '''
 
         poem = [None] * 4
@@ -747,56 +1380,74 @@ class Poet(object):
         poem[0] = ['Roses', 'are', 'red']
         poem[1] = ['Violets', 'are']
 
-        rhyme_word = random.choice(list(self.rhyme_dict.keys()))
+        rhyme_word = random.choice(self.rhyme_words())
         poem[1] += [rhyme_word]
 
         primary_cad = self.cadence(' '.join(poem[0]))
+        secondary_cad = '1**' + self.stress(rhyme_word)
 
-        poem[2] = self.generate_stress_line(primary_cad)
+        poem[2] = self.generate_stress_line(primary_cad, 
+            max_chars=self.line_budget(max_chars, poem[:2], [len(primary_cad), len(secondary_cad)]))
 
-        secondary_cad = '1**' + self.stress(rhyme_word)
+        # The line was cut off
+        if None in poem[2]:
+            return poem
 
         poem[3] = self.generate_matching_line(secondary_cad, rhyme_word, 
-            restricted=set([rhyme_word]))
+            restricted=set([rhyme_word]), 
+            max_chars=self.line_budget(max_chars, poem[:3], [len(secondary_cad)]))
 
         return poem
 
 
-    def compose_haiku(self):
+    @timed('compose_haiku')
+    def compose_haiku(self, max_chars=None):
         '''
         Generates a haiku, a three-line poem with the first and 
         third lines having five syllables each, and the second
         line having seven syllables.
+
+        If given a budget of characters, a line that does not fit is
+        cut off with a None
         '''
 
         lines = [None] * 3
 
-        lines[0] = self.generate_line(5)
-        lines[1] = self.generate_line(7)
-        lines[2] = self.generate_line(5)
+        lines[0] = self.generate_line(5, self.line_budget(max_chars, lines[:0], [5, 7, 5]))
+        lines[1] = self.generate_line(7, self.line_budget(max_chars, lines[:1], [7, 5]))
+        lines[2] = self.generate_line(5, self.line_budget(max_chars, lines[:2], [5]))
 
         return lines
 
-    def compose_doublet(self):
+    @timed('compose_doublet')
+    def compose_doublet(self, max_chars=None):
         '''
         Generates a doublet, a pair of rhyming lines that have the 
         same cadence, each with 8 syllables
+
+        If given a budget of characters, the last line is None if the
+        doublet does not fit
         '''
         lines = [None] * 2
-        lines[0] = self.generate_line(10)
 
         # Last word needs valid rhymes
-        while self.rhyme(lines[0][-1]) is None:
-            lines[0] = self.generate_line(8)
+        lines[0] = self.generate_seed_line(10, 
+            max_chars=self.line_budget(max_chars, lines[:0], [10, 10]))
+
+        # No seed fits the budget
+        if None in lines[0]:
+            return lines
 
         cadence = self.cadence(' '.join(lines[0]))
 
         # Generate a line matching the first line
-        lines[1] = self.generate_matching_line(cadence, lines[0][-1])
+        lines[1] = self.generate_matching_line(cadence, lines[0][-1], 
+            max_chars=self.line_budget(max_chars, lines[:1], [len(cadence)]))
 
         return lines
 
-    def compose_limerick(self):
+    @timed('compose_limerick')
+    def compose_limerick(self, max_chars=None):
         '''
         Generates a limerick.
 
@@ -807,6 +1458,9 @@ class Poet(object):
         *1**1
 
         The poem has a AABBA rhyme scheme.
+
+        If given a budget of characters, the lines left are None once
+        a line does not fit
         '''
 
         # Set the limerick cadences
@@ -814,38 +1468,68 @@ class Poet(object):
         secondary_cad = '*1**1'
 
         lines = [None] * 5
-        lines[0] = self.generate_stress_line(primary_cad)
+
+        # Syllables of the lines, in the order they are composed
+        sizes = [len(primary_cad)] * 3 + [len(secondary_cad)] * 2
 
         # Last word needs valid rhymes
-        while self.rhyme(lines[0][-1], min_rhymes=2) is None:
-            lines[0] = self.generate_stress_line(primary_cad)
+        lines[0] = self.generate_seed_stress_line(primary_cad, min_rhymes=2, 
+            max_chars=self.line_budget(max_chars, [], sizes))
+
+        if None in lines[0]:
+            return lines
 
         # Should not repeat rhymes
         restricted_rhymes = set([lines[0][-1]])
 
         lines[1] = self.generate_matching_line(primary_cad, lines[0][-1], 
-            restricted=restricted_rhymes)
+            restricted=restricted_rhymes, 
+            max_chars=self.line_budget(max_chars, lines, sizes[1:]))
+
+        while lines[1] is None:
+
+            # No rhyme fits the budget, so start over
+            if max_chars is not None:
+                return lines
+
+            self.checkpoint()
+            lines[1] = self.generate_matching_line(primary_cad, lines[0][-1], 
+                restricted=restricted_rhymes)
 
         # Add the last word to restricted rhymes
         restricted_rhymes.update([lines[1][-1]])
 
         lines[4] = self.generate_matching_line(primary_cad, lines[0][-1], 
-            restricted=restricted_rhymes)
+            restricted=restricted_rhymes, 
+            max_chars=self.line_budget(max_chars, lines, sizes[2:]))
+
+        while lines[4] is None:
+
+            if max_chars is not None:
+                return lines
+
+            self.checkpoint()
+            lines[4] = self.generate_matching_line(primary_cad, lines[0][-1], 
+                restricted=restricted_rhymes)
 
         restricted_rhymes.update([lines[4][-1]])
 
-        lines[2] = self.generate_stress_line(secondary_cad)
+        lines[2] = self.generate_seed_stress_line(secondary_cad, 
+            restricted=restricted_rhymes, 
+            max_chars=self.line_budget(max_chars, lines, sizes[3:]))
 
-        while self.rhyme(lines[2][-1]) is None:
-            lines[2] = self.generate_stress_line(secondary_cad)
+        if None in lines[2]:
+            return lines
 
         restricted_rhymes.update([lines[2][-1]])
 
         lines[3] = self.generate_matching_line(secondary_cad, lines[2][-1], 
-            restricted=restricted_rhymes)
+            restricted=restricted_rhymes, 
+            max_chars=self.line_budget(max_chars, lines, sizes[4:]))
 
         return lines
 
+    @timed('compose_sonnet')
     def compose_sonnet(self):
         '''
         Generates a sonnet in the style of Shakespeare
@@ -866,15 +1550,13 @@ class Poet(object):
         doublets = []
         for _ in range(7):
 
-            first_line = self.generate_stress_line(cadence)
-
             # Need valid rhyme
-            while self.rhyme(first_line[-1]) is None:
-                first_line = self.generate_stress_line(cadence)
+            first_line = self.generate_seed_stress_line(cadence)
 
             second_line = self.generate_matching_line(cadence, first_line[-1])
 
             while second_line is None:
+                self.checkpoint()
                 second_line = self.generate_matching_line(cadence, first_line[-1])
 
             doublets += [[first_line, second_line]]
@@ -894,7 +1576,8 @@ class Poet(object):
 
         return lines
 
-    def compose_quatrain(self):
+    @timed('compose_quatrain')
+    def compose_quatrain(self, max_chars=None):
         '''
         Composes an alternating quatrain in iambic tetrameter,
         in the style of Robert Frost.
@@ -903,6 +1586,9 @@ class Poet(object):
         *1*1*1*1
 
         The poem has AABA rhyme scheme.
+
+        If given a budget of characters, the lines left are None once
+        a line does not fit
         '''
 
         lines = [None] * 4
@@ -912,23 +1598,31 @@ class Poet(object):
         restricted_rhymes = set()
 
         # Generate first triplet
-        lines[0] = self.generate_stress_line(cadence)
+        lines[0] = self.generate_seed_stress_line(cadence, min_rhymes=2, 
+            max_chars=self.line_budget(max_chars, lines, [len(cadence)] * 4))
 
-        while self.rhyme(lines[0][-1], min_rhymes=2) is None:
-            lines[0] = self.generate_stress_line(cadence)
+        if None in lines[0]:
+            return lines
 
         restricted_rhymes.update([lines[0][-1]])
 
-        doublet = self.generate_multi_line(cadence, lines[0][-1], 2)
+        # Both rhyming lines get the same share of the budget
+        doublet = self.generate_multi_line(cadence, lines[0][-1], 2, 
+            max_chars=self.line_budget(max_chars, lines, [len(cadence)] * 3))
+
+        if doublet is None:
+            return lines
 
         lines[1] = doublet[0]
         lines[3] = doublet[1]
 
         # Generate the intermediate line
-        lines[2] = self.generate_stress_line(cadence)
+        lines[2] = self.generate_stress_line(cadence, 
+            max_chars=self.line_budget(max_chars, lines, [len(cadence)]))
 
         return lines
 
+    @timed('compose_villanelle')
     def compose_villanelle(self):
         '''
         Composes a villanelle with matching cadence,
@@ -939,23 +1633,15 @@ class Poet(object):
 
         lines = [None] * 19
 
-        # Generate first line 
-        lines[0] = self.generate_line(8)
-
-        # Need valid rhymes
-        while self.rhyme(lines[0][-1], min_rhymes=6) is None:
-            lines[0] = self.generate_line(8)
+        # Generate first line, which needs valid rhymes
+        lines[0] = self.generate_seed_line(8, min_rhymes=6)
 
         primary_cad = self.cadence(' '.join(lines[0]))
 
         sextet = self.generate_multi_line(primary_cad, lines[0][-1], 6)
 
-        # Generate secondary lines
-        lines[1] = self.generate_line(8)
-
-        # Need valid rhymes
-        while self.rhyme(lines[1][-1], min_rhymes=5) is None:
-            lines[1] = self.generate_line(8)
+        # Generate secondary lines, which need valid rhymes
+        lines[1] = self.generate_seed_line(8, min_rhymes=5)
 
         secondary_cad = self.cadence(' '.join(lines[1]))
 
@@ -988,6 +1674,7 @@ class Poet(object):
 
         return lines
 
+    @timed('compose_ballade')
     def compose_ballade(self):
         '''
         Composes a ballade, a long-form poem, but truncated to
@@ -998,25 +1685,20 @@ class Poet(object):
         a_rhymes = [None] * 2
 
         # Create a line with a rhyme-able word
-        a_rhymes[0] = self.generate_line(8)
-
-        while self.rhyme(a_rhymes[0][-1]) is None:
-            a_rhymes[0] = self.generate_line(8)
+        a_rhymes[0] = self.generate_seed_line(8)
 
         a_cadence = self.cadence(' '.join(a_rhymes[0]))
 
         a_rhymes[1] = self.generate_matching_line(a_cadence, a_rhymes[0][-1])
 
         while a_rhymes[1] is None:
-             a_rhymes[1] = self.generate_matching_line(a_cadence, a_rhymes[0][-1])
+            self.checkpoint()
+            a_rhymes[1] = self.generate_matching_line(a_cadence, a_rhymes[0][-1])
 
         b_rhymes = [None] * 6
 
-        b_rhymes[0] = self.generate_line(8)
-
         # b needs 6 total lines, so 5 rhymes total
-        while self.rhyme(b_rhymes[0][-1], min_rhymes=5) is None:
-            b_rhymes[0] = self.generate_line(8)
+        b_rhymes[0] = self.generate_seed_line(8, min_rhymes=5)
 
         b_cadence = self.cadence(' '.join(b_rhymes[0]))
 
@@ -1024,16 +1706,14 @@ class Poet(object):
 
         c_rhymes = [None] * 2
 
-        c_rhymes[0] = self.generate_line(8)
-
-        while self.rhyme(c_rhymes[0][-1], min_rhymes=2) is None:
-            c_rhymes[0] = self.generate_line(8)
+        c_rhymes[0] = self.generate_seed_line(8, min_rhymes=2)
 
         c_cadence = self.cadence(' '.join(c_rhymes[0]))
 
         c_rhymes[1:] = self.generate_multi_line(c_cadence, c_rhymes[0][-1], 2)
 
         while None in c_rhymes:
+            self.checkpoint()
             c_rhymes[1:] = self.generate_multi_line(c_cadence, c_rhymes[0][-1], 2)
 
         poem = [None] * 12
@@ -6,41 +6,53 @@ the word list.
 
 Usage:
 ------
-    python3 rhyme_dict.py [<filename>]
+    python3 rhyme_dict.py [<filename>] [<workers>]
 
-    will write the rhyming dictionary to the file [<filename>].pkl
+    will write the rhyming dictionary to the file [<filename>].pkl,
+    optionally sharing the work across a number of processes
+
+    python3 rhyme_dict.py [<filename>] --add [<file>] --remove [<file>]
+
+    will update the existing rhyming dictionary for the words of the 
+    given files being added to or removed from the corpus
 '''
 
 import nltk
 from nltk.corpus import cmudict
-import sys
 import pickle
+import argparse
+import multiprocessing
+
+from corpus import printProgress, vocabulary
+from rhyme_index import (build_tails, find_rhyme_entries, pack_rhyme_classes, rhyme_levels,
+    update_rhyme_classes)
 
 import os
 path = os.getcwd()
 
-# Print iterations progress
-def printProgress (iteration, total, prefix = '', suffix = '', decimals = 1, barLength = 100):
+# Number of shards handed to each worker process, so that the
+# progress bar moves regularly without redrawing for every word
+SHARDS_PER_WORKER = 16
+
+# Read-only data shared with the worker processes
+# When processes are forked, these pages are shared rather than copied
+shared = None
+
+def share(pron_dict, levels, tails):
     '''
-    Call in a loop to create terminal progress bar
-    @params:
-        iteration   - Required  : current iteration (Int)
-        total       - Required  : total iterations (Int)
-        prefix      - Optional  : prefix string (Str)
-        suffix      - Optional  : suffix string (Str)
-        decimals    - Optional  : positive number of decimals in percent complete (Int)
-        barLength   - Optional  : character length of bar (Int)
-    
-    Credit: http://stackoverflow.com/a/34325723
+    Sets the data shared with a worker process
     '''
-    formatStr       = "{0:." + str(decimals) + "f}"
-    percents        = formatStr.format(100 * (iteration / float(total)))
-    filledLength    = int(round(barLength * iteration / float(total)))
-    bar             = '█' * filledLength + '-' * (barLength - filledLength)
-    sys.stdout.write('\r%s |%s| %s%s %s' % (prefix, bar, percents, '%', suffix)),
-    if iteration == total:
-        sys.stdout.write('\n')
-    sys.stdout.flush()
+
+    global shared
+    shared = (pron_dict, levels, tails)
+
+def rhyme_shard(words):
+    '''
+    Finds the rhyme classes of a shard of the word list in a worker process
+    '''
+
+    pron_dict, levels, tails = shared
+    return find_rhyme_entries(words, pron_dict, levels, tails)
 
 class rhymer(object):
 
@@ -61,21 +73,15 @@ class rhymer(object):
         result = ''.join(letter for letter in word if letter.isalpha())
         return result.lower()
 
-    def load(self, filename):
+    def load(self, filename, progress=False):
         '''
         Overwrites the 10,000 most common English words with a new
         set of words generated from a corpus of text
-        '''
-        word_list = set()
 
-        file = open(path + '/' + filename)
-        raw_text = file.read().split()
-        for word in raw_text:
-            clean_word = self.sanitize(word)
-            if clean_word in self.dict:
-                word_list.update([clean_word])
+        The corpus is streamed in chunks, see corpus.py
+        '''
 
-        return word_list
+        return vocabulary(os.path.join(path, filename), self.dict, progress=progress)
 
     def rhyme_set(self, input_word, level):
         '''
@@ -108,62 +114,130 @@ class rhymer(object):
 
         return total_rhymes
 
-    def rhyme(self, word):
+    def rhyme(self, word, level=None):
         '''
         Determines the optimal rhyme level for a word and returns the 
-        corresponding rhyme set
+        corresponding rhyme set, or the rhyme set at the given level
         '''
-        num_elements = len(self.dict[word][0])
-        if num_elements < 4:
-            rhyme_level = num_elements
+        if level is not None:
+            rhyme_level = level
         else:
-            rhyme_level = num_elements - 1
+            num_elements = len(self.dict[word][0])
+            if num_elements < 4:
+                rhyme_level = num_elements
+            else:
+                rhyme_level = num_elements - 1
 
         # Get the rhyming set
         return self.rhyme_set(word, rhyme_level)
 
-    def write(self):
+    def write(self, workers=1):
         '''
         Writes a rhyming dictionary to a binary file that can be loaded later for 
         rapid rhyme retrieval
+
+        Rather than calling rhyme_set() for every word, which rescans the
+        whole word list each time, the words are grouped by the tails of
+        their pronunciations in a single pass (see rhyme_index.py), and
+        each group is written once as a rhyme class
+
+        The word list is split into shards, which are shared across the
+        given number of worker processes. The shards are merged back in
+        order, so the output does not depend on the number of workers.
         '''
 
-        # Initialize rhyming dictionary
-        ret_dict = {}
+        out_file = os.path.splitext(os.path.join(path, self.filename))[0] + '.pkl'
+        print('Writing to %s...' % out_file)
+
+        # Group the words by the tails of their pronunciations
+        words = sorted(self.word_list)
+        levels = rhyme_levels(words, self.dict)
+        tails = build_tails(words, self.dict, set(levels.values()))
+
+        # Split the word list into shards
+        num_shards = max(workers, 1) * SHARDS_PER_WORKER
+        shard_size = max(len(words) // num_shards, 1)
+        shards = [words[i:i + shard_size] for i in range(0, len(words), shard_size)]
+
+        # Initialize rhyme classes and progress bar
+        entries = {}
         count = 0
+        printProgress(count, max(len(words), 1), prefix = 'Progress:', suffix = 'Complete', barLength = 50)
 
-        # Intialize progress bar
-        out_file = os.path.splitext(path + '/' + self.filename)[0] + '.pkl'
-        print('Writing to %s...' % out_file)
-        printProgress(count, len(self.word_list), prefix = 'Progress:', suffix = 'Complete', barLength = 50)
+        if workers > 1:
+            pool = multiprocessing.Pool(workers, initializer=share, 
+                initargs=(self.dict, levels, tails))
+            results = pool.imap(rhyme_shard, shards)
+        else:
+            pool = None
+            share(self.dict, levels, tails)
+            results = map(rhyme_shard, shards)
 
-        for word in self.word_list:
+        # Get the rhyme classes of every word at its optimal level
+        for shard, shard_entries in zip(shards, results):
+            entries.update(shard_entries)
 
-            # Shorter words need higher rhyme levels to sound better
-            num_elements = len(self.dict[word][0])
-            if num_elements < 4:
-                rhyme_level = num_elements
-            else:
-                rhyme_level = num_elements - 1
+            # Show progress once per shard
+            count += len(shard)
+            printProgress(count, len(words), prefix = 'Progress:', suffix = 'Complete', barLength = 50)
+
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+        # Dump the rhyme classes in the file "[<filename>].pkl"
+        ret_dict = pack_rhyme_classes(entries, tails, self.dict, levels)
+        pickle.dump( ret_dict, open(out_file, 'wb') )
+        return ret_dict
+
+    def update(self, added=(), removed=()):
+        '''
+        Updates the rhyming dictionary written by write() for words added
+        to or removed from the word list, without rebuilding it
+
+        Only the rhyme classes sharing a pronunciation tail with an added
+        or removed word, and the entries of the words in them, are found
+        again (see rhyme_index.py). Dictionaries without the keys of their
+        classes, i.e. converted from the earlier format, are written anew.
+        '''
+
+        out_file = os.path.splitext(os.path.join(path, self.filename))[0] + '.pkl'
+
+        with open(out_file, 'rb') as f:
+            packed = pickle.load(f)
+
+        if not isinstance(packed, dict) or 'class_keys' not in packed:
+            return self.write()
+
+        print('Updating %s...' % out_file)
+
+        # Only words in the CMU dictionary can be added
+        added = set(word for word in map(self.sanitize, added) if word in self.dict)
+        removed = set(word for word in map(self.sanitize, removed) if word in self.dict)
 
-            # Get the rhyming set
-            rhyme_s = self.rhyme_set(word, rhyme_level)
-            if len(rhyme_s) > 0:
-                ret_dict[word] = rhyme_s
+        self.word_list = (set(self.word_list) | added) - removed
 
-            # Show progress
-            count += 1
-            printProgress(count, len(self.word_list), prefix = 'Progress:', suffix = 'Complete', barLength = 50)
+        ret_dict, affected = update_rhyme_classes(packed, self.word_list, self.dict, 
+            added - removed, removed)
+        print('Updated the rhymes of %d words' % len(affected))
 
-        # Dump the dictionary in the file "[<filename>].pkl"
         pickle.dump( ret_dict, open(out_file, 'wb') )
         return ret_dict
 
 if __name__ == '__main__':
-    try:
-        filename = sys.argv[1]
-    except:
-        print('Usage: python3 rhyme_dict.py [<path to file>]')
-        sys.exit(1)
-    rhyme = rhymer(filename)
-    rhyme.write()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Writes the rhyming dictionary of a corpus')
+    parser.add_argument('filename', help='path to corpus')
+    parser.add_argument('workers', nargs='?', type=int, default=1, 
+        help='number of worker processes')
+    parser.add_argument('--add', help='path to text of words added to the corpus')
+    parser.add_argument('--remove', help='path to text of words removed from the corpus')
+    args = parser.parse_args()
+
+    rhyme = rhymer(args.filename)
+
+    if args.add or args.remove:
+        added = rhyme.load(args.add) if args.add else set()
+        removed = rhyme.load(args.remove) if args.remove else set()
+        rhyme.update(added, removed)
+    else:
+        rhyme.write(args.workers)
\ No newline at end of file
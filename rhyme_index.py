@@ -0,0 +1,506 @@
+'''
+Rhyme Index
+===========
+Groups the words of a corpus by the tail of their pronunciation,
+so that the rhyme sets of every word can be found in one pass over
+the word list instead of rescanning it for every word.
+
+Two pronunciations rhyme at level k if their last k phonemes match
+once the stresses are discarded. Words are filed under the stress-
+stripped tail of each of their pronunciations, at each rhyme level
+in use, and a rhyme set is then read straight out of the bucket.
+
+Since every word of a bucket rhymes with every other, less those of
+the very same pronunciation, the rhyming dictionary is stored as
+rhyme classes: each bucket is kept once as a sorted array of word ids,
+and each word lists the classes it rhymes within, along with the ids
+of the words in them that it does not rhyme with. Its size thus grows
+linearly with the word list, rather than with the square of it.
+
+Rhymes at any other level are found in a reversed-phoneme trie of the
+word list, flattened into the sorted list of reversed pronunciations.
+The pronunciations ending in a given tail are then a contiguous run of
+the list, found by bisection, so the rhymes of a word at every level
+are found in time proportional to their number, without a rebuild.
+
+Usage:
+------
+    >>> from nltk.corpus import cmudict
+    >>> rhymes = build_rhyme_sets(word_list, cmudict.dict())
+    >>> classes = build_rhyme_classes(word_list, cmudict.dict())
+'''
+
+from array import array
+
+# Version of the rhyme class format written by pack_rhyme_classes()
+RHYME_CLASSES_VERSION = 2
+
+# Phoneme ids are stored as bytes in the trie, the highest of which
+# sorts after every key continuing a given tail
+MAX_PHONEMES = 255
+TRIE_END = bytes([MAX_PHONEMES])
+
+# Cache of stress-stripped phonemes, e.g. 'AH0' -> 'ah'
+phoneme_cache = {}
+
+def strip_phoneme(phoneme):
+    '''
+    Strips phoneme of its stress marker
+    '''
+
+    try:
+        return phoneme_cache[phoneme]
+    except KeyError:
+        result = ''.join(letter for letter in phoneme if letter.isalpha()).lower()
+        phoneme_cache[phoneme] = result
+        return result
+
+def strip_stress(pronunciation):
+    '''
+    Discards the stresses of a pronunciation
+    '''
+
+    return tuple(strip_phoneme(phoneme) for phoneme in pronunciation)
+
+def rhyme_level(pronunciation):
+    '''
+    Determines the optimal rhyme level for a pronunciation
+
+    Shorter words need higher rhyme levels to sound better
+    '''
+
+    num_elements = len(pronunciation)
+    if num_elements < 4:
+        return num_elements
+    else:
+        return num_elements - 1
+
+def build_tails(word_list, pron_dict, levels):
+    '''
+    Files every pronunciation of every word under its tail at each of
+    the given rhyme levels
+
+    Returns a dictionary mapping each level to a dictionary of tails,
+    whose values are lists of (word, pronunciation) pairs
+    '''
+
+    tails = {level: {} for level in levels}
+
+    for word in word_list:
+        for raw_pron in pron_dict[word]:
+            pron = strip_stress(raw_pron)
+            for level, buckets in tails.items():
+                key = pron[-level:]
+                if key in buckets:
+                    buckets[key].append((word, pron))
+                else:
+                    buckets[key] = [(word, pron)]
+
+    return tails
+
+def rhyme_levels(word_list, pron_dict):
+    '''
+    Returns a dictionary mapping each word to the rhyme level of its
+    primary pronunciation
+    '''
+
+    return {word: rhyme_level(pron_dict[word][0]) for word in word_list}
+
+def find_rhyme_sets(words, pron_dict, levels, tails):
+    '''
+    Returns a dictionary mapping each of the given words to its set of
+    rhymes in the tails built by build_tails(), leaving out words without
+    rhymes
+    '''
+
+    rhyme_sets = {}
+
+    for word in words:
+        level = levels[word]
+        buckets = tails[level]
+
+        rhymes = set()
+        for raw_syllable in pron_dict[word]:
+            syllable = strip_stress(raw_syllable)
+
+            # Matching tails, but not the very same pronunciation
+            for other, pron in buckets.get(syllable[-level:], ()):
+                if pron != syllable:
+                    rhymes.add(other)
+
+        if len(rhymes) > 0:
+            rhyme_sets[word] = rhymes
+
+    return rhyme_sets
+
+def build_rhyme_sets(word_list, pron_dict, levels=None):
+    '''
+    Returns a dictionary mapping each word in the word list to its set
+    of rhymes within the word list, leaving out words without rhymes
+
+    The rhyme level of a word is given by rhyme_level() on its primary
+    pronunciation, unless the levels dictionary gives it explicitly.
+    The rhyme sets match those found by a full scan of the word list.
+    '''
+
+    if levels is None:
+        levels = rhyme_levels(word_list, pron_dict)
+
+    tails = build_tails(word_list, pron_dict, set(levels.values()))
+
+    return find_rhyme_sets(sorted(levels), pron_dict, levels, tails)
+
+def find_rhyme_entries(words, pron_dict, levels, tails):
+    '''
+    Returns a dictionary mapping each of the given words to the list of
+    its rhyme classes in the tails built by build_tails(), leaving out
+    words without rhymes
+
+    Each class is given as a (level, tail) key, along with the set of
+    words in it that the word does not rhyme with, i.e. those whose only
+    pronunciation in the class is the very same as one of the word's.
+    Together they hold the same rhymes as find_rhyme_sets().
+    '''
+
+    # Number of words in each class, and its words by their only
+    # pronunciation in it, found on first use
+    sizes = {}
+    homophones = {}
+
+    entries = {}
+
+    for word in words:
+        level = levels[word]
+        buckets = tails[level]
+
+        excluded = {}
+        for raw_syllable in pron_dict[word]:
+            syllable = strip_stress(raw_syllable)
+            key = (level, syllable[-level:])
+
+            if key not in homophones:
+                prons = {}
+                for other, pron in buckets.get(key[1], ()):
+                    prons.setdefault(other, set()).add(pron)
+
+                sizes[key] = len(prons)
+                homophones[key] = by_pron = {}
+                for other, other_prons in prons.items():
+                    if len(other_prons) == 1:
+                        by_pron.setdefault(next(iter(other_prons)), set()).add(other)
+
+            # A word rhymes with a class member through any pronunciation
+            same = homophones[key].get(syllable, set())
+            if key in excluded:
+                excluded[key] &= same
+            else:
+                excluded[key] = set(same)
+
+        # Leave out the classes the word rhymes with none of
+        word_entries = [(key, others) for key, others in excluded.items() if len(others) < sizes[key]]
+
+        if len(word_entries) > 0:
+            entries[word] = word_entries
+
+    return entries
+
+def pack_rhyme_trie(words, pron_dict, levels):
+    '''
+    Returns the reversed-phoneme trie of the given sorted words, as the
+    sorted list of phonemes, the sorted list of reversed pronunciations
+    as bytes of phoneme ids, the array of the word id of each one, and
+    the array of the rhyme level of each word
+    '''
+
+    prons = [(index, strip_stress(raw_pron)) for index, word in enumerate(words)
+        for raw_pron in pron_dict[word]]
+
+    phonemes = sorted(set(phoneme for _, pron in prons for phoneme in pron))
+    if len(phonemes) >= MAX_PHONEMES:
+        raise ValueError('Too many phonemes for the rhyme trie', len(phonemes))
+
+    phoneme_ids = {phoneme: index for index, phoneme in enumerate(phonemes)}
+
+    keys = sorted((bytes(phoneme_ids[phoneme] for phoneme in reversed(pron)), index)
+        for index, pron in prons)
+
+    return (phonemes, [key for key, _ in keys], array('I', [index for _, index in keys]),
+        array('B', [levels[word] for word in words]))
+
+def pack_rhyme_classes(entries, tails, pron_dict=None, levels=None, keyed=True):
+    '''
+    Packs the rhyme classes found by find_rhyme_entries() into the sorted
+    list of words and flat arrays of word and class ids, to be pickled
+
+    If given the pronunciations and rhyme levels of the word list, all of
+    its words are kept, along with their reversed-phoneme trie, so that
+    their rhymes can be found at any level
+
+    Returns a dictionary of:
+
+        words               sorted list of all the words in a class
+        class_offsets       offsets of each class in members
+        members             sorted word ids of each class
+        entry_offsets       offsets of each word's classes in entry_classes
+        entry_classes       class ids of each word with rhymes
+        excluded_offsets    offsets of each entry's words in excluded
+        excluded            sorted ids of the words an entry leaves out
+
+    and unless keyed is False:
+
+        class_keys          (level, tail) key of each class, so that the
+                            classes can be updated, see update_rhyme_classes()
+
+    and if the trie is kept:
+
+        phonemes            sorted list of the stress-stripped phonemes
+        trie_keys           sorted reversed pronunciations, as phoneme ids
+        trie_words          word id of each reversed pronunciation
+        levels              rhyme level of each word
+    '''
+
+    # Number the classes in order of first use, so the output is stable
+    class_ids = {}
+    for word in sorted(entries):
+        for key, _ in entries[word]:
+            if key not in class_ids:
+                class_ids[key] = len(class_ids)
+
+    class_words = [None] * len(class_ids)
+    for (level, tail), class_id in class_ids.items():
+        class_words[class_id] = set(other for other, _ in tails[level][tail])
+
+    words = set(entries).union(*class_words)
+    if levels is not None:
+        words.update(levels)
+    words = sorted(words)
+    ids = {word: index for index, word in enumerate(words)}
+
+    class_offsets = array('I', [0])
+    members = array('I')
+    for others in class_words:
+        members.extend(sorted(ids[other] for other in others))
+        class_offsets.append(len(members))
+
+    entry_offsets = array('I', [0])
+    entry_classes = array('I')
+    excluded_offsets = array('I', [0])
+    excluded = array('I')
+    for word in words:
+        for key, others in entries.get(word, ()):
+            entry_classes.append(class_ids[key])
+            excluded.extend(sorted(ids[other] for other in others))
+            excluded_offsets.append(len(excluded))
+        entry_offsets.append(len(entry_classes))
+
+    packed = {
+        'version': RHYME_CLASSES_VERSION,
+        'words': words,
+        'class_offsets': class_offsets,
+        'members': members,
+        'entry_offsets': entry_offsets,
+        'entry_classes': entry_classes,
+        'excluded_offsets': excluded_offsets,
+        'excluded': excluded,
+    }
+
+    if keyed:
+        class_keys = [None] * len(class_ids)
+        for key, class_id in class_ids.items():
+            class_keys[class_id] = key
+        packed['class_keys'] = class_keys
+
+    if pron_dict is not None and levels is not None:
+        (packed['phonemes'], packed['trie_keys'], packed['trie_words'], 
+            packed['levels']) = pack_rhyme_trie(words, pron_dict, levels)
+
+    return packed
+
+def build_rhyme_classes(word_list, pron_dict, levels=None):
+    '''
+    Returns the rhyme classes of the word list, packed by
+    pack_rhyme_classes() along with the trie of the word list, holding
+    the same rhymes as build_rhyme_sets()
+    '''
+
+    if levels is None:
+        levels = rhyme_levels(word_list, pron_dict)
+
+    tails = build_tails(word_list, pron_dict, set(levels.values()))
+
+    entries = find_rhyme_entries(sorted(levels), pron_dict, levels, tails)
+
+    return pack_rhyme_classes(entries, tails, pron_dict, levels)
+
+def classes_from_sets(rhyme_sets, pron_dict=None, levels=None):
+    '''
+    Packs a dictionary mapping words to rhyme sets into rhyme classes,
+    as written by pack_rhyme_classes()
+
+    Each word and its rhymes make up a class, which is only stored once
+    for all the words sharing it. Used to convert rhyming dictionaries
+    of the earlier format, which mapped every word to its own set. The
+    trie is only kept if given the pronunciations and rhyme levels of
+    the word list, see pack_rhyme_classes().
+    '''
+
+    entries = {}
+    tails = {0: {}}
+
+    for word, rhymes in rhyme_sets.items():
+        if len(rhymes) == 0:
+            continue
+
+        key = (0, frozenset(rhymes) | {word})
+        tails[0].setdefault(key[1], [(other, None) for other in key[1]])
+
+        # A word does not rhyme with itself, unless it has two pronunciations
+        entries[word] = [(key, set() if word in rhymes else {word})]
+
+    return pack_rhyme_classes(entries, tails, pron_dict, levels, keyed=False)
+
+def affected_tails(word_list, pron_dict, added=(), removed=()):
+    '''
+    Returns the rhyme levels of the word list, as it stands after words
+    have been added or removed, along with the set of words whose rhymes
+    may have changed, and the set of their (level, tail) keys
+
+    Only the words sharing a tail with an added or removed word can
+    change.
+    '''
+
+    levels = rhyme_levels(word_list, pron_dict)
+    used_levels = set(levels.values())
+
+    # Tails of the added and removed pronunciations, at every level in use
+    delta_tails = set()
+    for word in set(added) | set(removed):
+        for raw_pron in pron_dict[word]:
+            pron = strip_stress(raw_pron)
+            for level in used_levels:
+                delta_tails.add((level, pron[-level:]))
+
+    # Words whose own tail is one of them
+    affected = set(word for word in added if word in levels)
+    for word, level in levels.items():
+        for raw_pron in pron_dict[word]:
+            if (level, strip_stress(raw_pron)[-level:]) in delta_tails:
+                affected.add(word)
+                break
+
+    keys = set()
+    for word in affected:
+        level = levels[word]
+        for raw_pron in pron_dict[word]:
+            keys.add((level, strip_stress(raw_pron)[-level:]))
+
+    return levels, affected, keys
+
+def build_key_tails(word_list, pron_dict, keys):
+    '''
+    Files the pronunciations of the word list as build_tails() does, but
+    only under the given (level, tail) keys
+    '''
+
+    tails = {level: {} for level, _ in keys}
+    for word in word_list:
+        for raw_pron in pron_dict[word]:
+            pron = strip_stress(raw_pron)
+            for level, buckets in tails.items():
+                key = pron[-level:]
+                if (level, key) in keys:
+                    if key in buckets:
+                        buckets[key].append((word, pron))
+                    else:
+                        buckets[key] = [(word, pron)]
+
+    return tails
+
+def update_rhyme_sets(rhyme_sets, word_list, pron_dict, added=(), removed=()):
+    '''
+    Updates the rhyme sets built by build_rhyme_sets() in place, after
+    words have been added to or removed from the word list, which is
+    given as it stands after the change
+
+    Only the words sharing a tail with an added or removed word can
+    change, so only their rhyme sets are found again. Returns the set
+    of words that were found again.
+    '''
+
+    levels, affected, keys = affected_tails(word_list, pron_dict, added, removed)
+
+    # Only file the pronunciations under the tails of the affected words
+    tails = build_key_tails(word_list, pron_dict, keys)
+
+    updated = find_rhyme_sets(sorted(affected), pron_dict, levels, tails)
+
+    for word in removed:
+        rhyme_sets.pop(word, None)
+
+    for word in affected:
+        if word in updated:
+            rhyme_sets[word] = updated[word]
+        else:
+            rhyme_sets.pop(word, None)
+
+    return affected
+
+def unpack_rhyme_classes(packed):
+    '''
+    Returns the entries of each word and the tails of each class of rhyme
+    classes packed with their keys by pack_rhyme_classes(), in the form
+    they were packed from
+    '''
+
+    words = packed['words']
+    class_keys = packed['class_keys']
+    class_offsets = packed['class_offsets']
+    members = packed['members']
+    excluded_offsets = packed['excluded_offsets']
+    excluded = packed['excluded']
+    entry_offsets = packed['entry_offsets']
+    entry_classes = packed['entry_classes']
+
+    tails = {}
+    for class_id, (level, tail) in enumerate(class_keys):
+        tails.setdefault(level, {})[tail] = [(words[index], None)
+            for index in members[class_offsets[class_id]:class_offsets[class_id + 1]]]
+
+    entries = {}
+    for index, word in enumerate(words):
+        if entry_offsets[index + 1] > entry_offsets[index]:
+            entries[word] = [(class_keys[entry_classes[entry]],
+                set(words[other] for other in excluded[excluded_offsets[entry]:excluded_offsets[entry + 1]]))
+                for entry in range(entry_offsets[index], entry_offsets[index + 1])]
+
+    return entries, tails
+
+def update_rhyme_classes(packed, word_list, pron_dict, added=(), removed=()):
+    '''
+    Returns the rhyme classes packed with their keys by pack_rhyme_classes()
+    after words have been added to or removed from the word list, which
+    is given as it stands after the change, along with the set of words
+    whose classes were found again
+
+    Only the classes sharing a tail with an added or removed word, and
+    the entries of the words in them, are found again. The rest are kept
+    as they are, so the result is the same as building them anew.
+    '''
+
+    levels, affected, keys = affected_tails(word_list, pron_dict, added, removed)
+
+    entries, tails = unpack_rhyme_classes(packed)
+
+    # Replace the changed classes and the entries of their words
+    key_tails = build_key_tails(word_list, pron_dict, keys)
+    for level, buckets in key_tails.items():
+        tails.setdefault(level, {}).update(buckets)
+
+    updated = find_rhyme_entries(sorted(affected), pron_dict, levels, key_tails)
+
+    for word in set(removed) | affected:
+        entries.pop(word, None)
+    entries.update(updated)
+
+    trie = 'trie_keys' in packed
+    return pack_rhyme_classes(entries, tails, pron_dict if trie else None, levels), affected
@@ -0,0 +1,456 @@
+'''
+Rhyme Sets
+==========
+Immutable rhyme sets for the Poet, which can be shared between
+poems, threads and forked processes without being copied.
+
+The rhymes are kept as a sorted tuple to sample from, along with a
+frozenset for membership. Rhymes outside a restricted set are drawn
+by rejection sampling, since the restricted words of a poem are few,
+so the rhyme set is never copied or modified to leave them out.
+
+The rhyming dictionary is loaded as RhymeClasses, whose rhyme sets
+share the words of their rhyme class (see rhyme_index.py), leaving
+out the few words of the class that a word does not rhyme with. If
+compiled with its RhymeTrie, rhymes can also be found at any level.
+
+Usage:
+------
+    >>> rhymes = RhymeSet(['bay', 'day', 'hay'])
+    >>> rhymes.sample(restricted={'day'})     # 'bay' or 'hay'
+    >>> rhyme_dict = load_rhyme_dict('data/english.pkl')
+    >>> rhyme_dict.rhyme_set('day')
+    >>> rhyme_dict.rhymes_at('holiday', 2)    # slant rhymes
+'''
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+import pickle
+import random
+
+from rhyme_index import RHYME_CLASSES_VERSION, TRIE_END, classes_from_sets
+
+# Draws to reject before listing the rhymes outside the restricted set
+REJECTION_TRIES = 8
+
+class RhymeSet(object):
+
+    __slots__ = ('words', 'members', 'excluded')
+
+    def __init__(self, words, excluded=()):
+        self.words = tuple(sorted(words))
+        self.members = frozenset(self.words)
+        self.excluded = self.members.intersection(excluded)
+
+    def exclude(self, excluded):
+        '''
+        Returns a rhyme set of the same words, less the excluded ones,
+        sharing the words of this one rather than copying them
+        '''
+
+        rhymes = RhymeSet.__new__(RhymeSet)
+        rhymes.words = self.words
+        rhymes.members = self.members
+        rhymes.excluded = self.members.intersection(excluded)
+        return rhymes
+
+    def __len__(self):
+        return len(self.words) - len(self.excluded)
+
+    def __iter__(self):
+        if len(self.excluded) == 0:
+            return iter(self.words)
+        return (word for word in self.words if word not in self.excluded)
+
+    def __contains__(self, word):
+        return word in self.members and word not in self.excluded
+
+    def count(self, restricted=()):
+        '''
+        Returns the number of rhymes outside the restricted set
+        '''
+
+        return len(self) - sum(1 for word in restricted if word in self)
+
+    def without(self, restricted=()):
+        '''
+        Returns a new set of the rhymes outside the restricted set
+        '''
+
+        return self.members.difference(self.excluded, restricted)
+
+    def sample(self, restricted=()):
+        '''
+        Returns a random rhyme outside the restricted set, or None if
+        there is none
+        '''
+
+        words = self.words
+        excluded = self.excluded
+
+        if len(words) == 0:
+            return None
+
+        if len(restricted) == 0 and len(excluded) == 0:
+            return random.choice(words)
+
+        # Most draws miss the few restricted and excluded words
+        for _ in range(REJECTION_TRIES):
+            word = random.choice(words)
+            if word not in restricted and word not in excluded:
+                return word
+
+        # The restricted words make up much of the set, so list the rest
+        rest = [word for word in words if word not in restricted and word not in excluded]
+
+        if len(rest) == 0:
+            return None
+
+        return random.choice(rest)
+
+class RhymeClasses(Mapping):
+    '''
+    Rhyming dictionary stored as rhyme classes (see rhyme_index.py)
+
+    Maps words to new sets of their rhymes, like the rhyming dictionaries
+    of the earlier format, while rhyme_set() returns a RhymeSet sharing
+    the words of the class, so each class is only held once in memory.
+    '''
+
+    def __init__(self, data):
+        if data.get('version') != RHYME_CLASSES_VERSION:
+            raise ValueError('Unsupported rhyming dictionary version', data.get('version'))
+
+        self.words = data['words']
+        self.class_offsets = data['class_offsets']
+        self.members = data['members']
+        self.entry_offsets = data['entry_offsets']
+        self.entry_classes = data['entry_classes']
+        self.excluded_offsets = data['excluded_offsets']
+        self.excluded = data['excluded']
+
+        self.ids = {word: index for index, word in enumerate(self.words)}
+
+        # Rhyme set of each class, built on first use
+        self.class_sets = {}
+
+        # Only rhyming dictionaries compiled from the pronunciations have a trie
+        if 'trie_keys' in data:
+            self.trie = RhymeTrie(self.words, data['trie_keys'], data['trie_words'], data['levels'],
+                data['phonemes'])
+        else:
+            self.trie = None
+
+        # Number of words with rhymes, counted on first use
+        self.num_rhyming = None
+
+    def class_set(self, class_id):
+        '''
+        Returns the RhymeSet of all the words of a class
+        '''
+
+        try:
+            return self.class_sets[class_id]
+        except KeyError:
+            pass
+
+        members = self.members[self.class_offsets[class_id]:self.class_offsets[class_id + 1]]
+        rhymes = RhymeSet(map(self.word, members))
+
+        self.class_sets[class_id] = rhymes
+        return rhymes
+
+    def entries(self, index):
+        '''
+        Returns the range of the entries of the word at the given index
+        '''
+
+        return range(self.entry_offsets[index], self.entry_offsets[index + 1])
+
+    def excluded_words(self, entry):
+        '''
+        Returns the words of the class of an entry that it leaves out
+        '''
+
+        return list(map(self.word,
+            self.excluded[self.excluded_offsets[entry]:self.excluded_offsets[entry + 1]]))
+
+    def index(self, word):
+        '''
+        Returns the index of the word, or None if it is missing
+        '''
+
+        return self.ids.get(word)
+
+    def word(self, index):
+        '''
+        Returns the word at the given index
+        '''
+
+        return self.words[index]
+
+    def rhyme_set(self, word):
+        '''
+        Returns the immutable RhymeSet of the word, or None if it has no
+        rhymes
+        '''
+
+        index = self.index(word)
+        if index is None:
+            return None
+
+        entries = self.entries(index)
+        if len(entries) == 0:
+            return None
+
+        if len(entries) == 1:
+            entry = entries[0]
+            return self.class_set(self.entry_classes[entry]).exclude(self.excluded_words(entry))
+
+        # Words with pronunciations in several classes rhyme within all of them
+        rhymes = set()
+        for entry in entries:
+            rhymes.update(self.class_set(self.entry_classes[entry]).without(self.excluded_words(entry)))
+
+        return RhymeSet(rhymes)
+
+    def rhyme_level(self, word):
+        '''
+        Returns the rhyme level of the rhyme set of the word, or None if
+        the word or the trie is missing
+        '''
+
+        index = self.index(word)
+        if index is None or self.trie is None:
+            return None
+
+        return self.trie.levels[index]
+
+    def rhymes_at(self, word, level):
+        '''
+        Returns the immutable RhymeSet of the word at the given level, or
+        None if it has no rhymes at that level, or there is no trie
+        '''
+
+        index = self.index(word)
+        if index is None or self.trie is None:
+            return None
+
+        rhymes = self.trie.rhyme_set(index, level)
+        if len(rhymes) == 0:
+            return None
+
+        return rhymes
+
+    def __getitem__(self, word):
+        rhymes = self.rhyme_set(word)
+
+        if rhymes is None:
+            raise KeyError(word)
+
+        return set(rhymes)
+
+    def __contains__(self, word):
+        index = self.index(word)
+        return index is not None and len(self.entries(index)) > 0
+
+    def __iter__(self):
+        offsets = self.entry_offsets
+        return (self.word(index) for index in range(len(offsets) - 1) if offsets[index + 1] > offsets[index])
+
+    def __len__(self):
+        if self.num_rhyming is None:
+            self.num_rhyming = sum(1 for _ in self)
+        return self.num_rhyming
+
+class RhymeTrie(object):
+    '''
+    Reversed-phoneme trie of a word list, flattened into the sorted list
+    of reversed pronunciations (see rhyme_index.py)
+
+    All the pronunciations ending in the same tail of k phonemes make up
+    a contiguous run of the list, found by bisection, so the rhymes of a
+    word at level k take time proportional to their number.
+    '''
+
+    def __init__(self, words, keys, key_words, levels, phonemes=None):
+        self.words = words
+        self.keys = keys
+        self.key_words = key_words
+        self.levels = levels
+
+        # Ids of the phonemes, to look up pronunciations of other words
+        if phonemes is None:
+            self.phoneme_ids = None
+        else:
+            self.phoneme_ids = {phoneme: index for index, phoneme in enumerate(phonemes)}
+
+        # Positions of the pronunciations of each word, listed on first use
+        self.word_keys = None
+
+        # RhymeSet of the words ending in each reversed tail, see tail_set()
+        self.tail_sets = {}
+
+    def prons(self, index):
+        '''
+        Returns the positions in the trie of the pronunciations of the word
+        at the given index
+        '''
+
+        if self.word_keys is None:
+            word_keys = {}
+            for position, word in enumerate(self.key_words):
+                word_keys.setdefault(word, []).append(position)
+            self.word_keys = word_keys
+
+        return self.word_keys.get(index, ())
+
+    def rhymes(self, index, level):
+        '''
+        Returns the set of words rhyming with the word at the given index
+        at the given level, i.e. whose last level phonemes match those of
+        one of its pronunciations, without the very same pronunciation
+        '''
+
+        keys = self.keys
+        rhymes = set()
+
+        for position in self.prons(index):
+            key = keys[position]
+
+            # Shorter pronunciations have no tail at this level
+            if level > len(key) or level < 1:
+                continue
+
+            self.add_rhymes(rhymes, key[:level], key)
+
+        return rhymes
+
+    def rhyme_set(self, index, level):
+        '''
+        Returns the immutable RhymeSet of the same rhymes as rhymes(), which
+        shares the words ending in the same tail with the other words of
+        that tail, rather than listing them for every word
+        '''
+
+        keys = self.keys
+        rhyme_sets = []
+
+        for position in self.prons(index):
+            key = keys[position]
+
+            # Shorter pronunciations have no tail at this level
+            if level > len(key) or level < 1:
+                continue
+
+            tail = key[:level]
+            start = bisect_left(keys, tail)
+            end = bisect_left(keys, tail + TRIE_END, start)
+
+            rhyme_sets.append(self.tail_set(tail, start, end).exclude(
+                self.same_words(key, start, end)))
+
+        if len(rhyme_sets) == 1:
+            return rhyme_sets[0]
+
+        # Words with pronunciations at several tails rhyme within all of them
+        return RhymeSet(set().union(*rhyme_sets))
+
+    def tail_set(self, tail, start, end):
+        '''
+        Returns the RhymeSet of the words of the pronunciations from start
+        to end, which start with the reversed tail
+        '''
+
+        try:
+            return self.tail_sets[tail]
+        except KeyError:
+            pass
+
+        words = self.words
+        key_words = self.key_words
+        rhymes = RhymeSet(set(words[key_words[other]] for other in range(start, end)))
+
+        self.tail_sets[tail] = rhymes
+        return rhymes
+
+    def same_words(self, key, start, end):
+        '''
+        Returns the words whose only pronunciations from start to end are
+        the very same as the key, which do not rhyme with it
+        '''
+
+        keys = self.keys
+        key_words = self.key_words
+
+        same = []
+
+        # The very same pronunciations are next to each other
+        first = bisect_left(keys, key, start, end)
+        for other in range(first, bisect_right(keys, key, first, end)):
+            if all(keys[position] == key for position in self.prons(key_words[other]) 
+                    if start <= position < end):
+                same.append(self.words[key_words[other]])
+
+        return same
+
+    def find(self, pron, level):
+        '''
+        Returns the set of words rhyming at the given level with a
+        stress-stripped pronunciation, which need not be in the trie
+        '''
+
+        rhymes = set()
+
+        if level > len(pron) or level < 1:
+            return rhymes
+
+        # A phoneme missing from the trie ends no pronunciation in it
+        tail = self.encode(pron[-level:])
+        if tail is None:
+            return rhymes
+
+        self.add_rhymes(rhymes, tail, self.encode(pron))
+        return rhymes
+
+    def encode(self, pron):
+        '''
+        Returns the reversed pronunciation as bytes of phoneme ids, or
+        None if a phoneme is missing from the trie
+        '''
+
+        try:
+            return bytes(self.phoneme_ids[phoneme] for phoneme in reversed(pron))
+        except KeyError:
+            return None
+
+    def add_rhymes(self, rhymes, tail, key):
+        '''
+        Adds the words of the pronunciations starting with the reversed
+        tail to the rhymes, other than those of the very same key
+        '''
+
+        keys = self.keys
+        words = self.words
+        key_words = self.key_words
+
+        start = bisect_left(keys, tail)
+        end = bisect_left(keys, tail + TRIE_END, start)
+
+        for other in range(start, end):
+            if keys[other] != key:
+                rhymes.add(words[key_words[other]])
+
+def load_rhyme_dict(filename):
+    '''
+    Loads a rhyming dictionary written by rhyme_dict.py as RhymeClasses,
+    converting it first if it maps every word to its own set of rhymes
+    '''
+
+    data = pickle.load( open(filename, 'rb') )
+
+    # The earlier format is a plain dictionary of sets
+    if not isinstance(data.get('version'), int):
+        data = classes_from_sets(data)
+
+    return RhymeClasses(data)
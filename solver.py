@@ -0,0 +1,689 @@
+'''
+Line Solver
+===========
+Composition engine for rhymed, metered lines, used by the Poet
+in place of random restarts.
+
+The solver works out once, for every pattern it meets, whether the
+pattern can be filled with whole words from the corpus. Lines are
+then built by forward checking: a word is only ever drawn if the
+rest of the pattern can still be filled after it, so a feasible
+pattern is always completed on the first attempt and an infeasible
+one is rejected at once.
+
+For rhymed lines, the rhyme word is fixed first, and the prefix of
+the pattern in front of it is filled afterwards.
+
+Lines can also be given a budget of characters. The solver works out
+the fewest characters each pattern can be filled with, and each word
+is drawn from those short enough to leave room for the rest, so a
+line that fits the budget at all is completed on the first attempt.
+
+Usage:
+------
+    >>> p = Poet(engine='solver')
+    >>> p.print_villanelle()
+'''
+
+import bisect
+import random
+
+# Number of (pattern, word) pairs whose usable rhymes are kept
+RHYME_CACHE_SIZE = 100000
+
+# Characters needed for a pattern that cannot be filled
+INFINITY = float('inf')
+
+class LineSolver(object):
+
+    def __init__(self, poet):
+        self.poet = poet
+
+        # Whether each pattern can be filled with whole words
+        self.feasible_cache = {'': True}
+
+        # Stress buckets that keep each pattern feasible, with cumulative sizes
+        self.move_cache = {}
+
+        # Words known to make feasible rhyme seeds, see seed_words()
+        self.seed_cache = {}
+
+        # Rhymes that can end a line on each pattern, see usable_rhymes()
+        self.rhyme_cache = {}
+
+        # Fewest characters to fill each pattern, see min_chars()
+        self.chars_cache = {'': 0}
+        self.syllable_chars_cache = [0]
+
+        # Buckets sorted by word length, built on first use, see short_buckets()
+        self.short_stress = None
+        self.short_syllables = None
+
+        # Length sorted buckets that match the start of each pattern
+        self.short_cache = {}
+
+        # Fewest characters in front of the last word of a line on each pattern
+        self.prefix_cache = {}
+
+        # Seed words sorted by the characters their lines need, see short_seeds()
+        self.short_seed_cache = {}
+
+    def line_pattern(self, pattern):
+        '''
+        Returns the pattern that fills a line, as in generate_stress_line(),
+        since there are no one syllable words with primary stress
+        '''
+
+        if len(pattern) > 0 and pattern[-1] == '1':
+            return pattern[:-1] + '*'
+        else:
+            return pattern
+
+    def feasible(self, pattern):
+        '''
+        Returns whether the pattern can be filled with whole words
+        '''
+
+        if pattern in self.feasible_cache:
+            return self.feasible_cache[pattern]
+
+        stress_index = self.poet.stress_index
+
+        # Work back from the end of the pattern, so that the rest of the
+        # pattern after any word has always been solved already
+        for start in range(len(pattern) - 1, -1, -1):
+            suffix = pattern[start:]
+            if suffix in self.feasible_cache:
+                continue
+
+            self.feasible_cache[suffix] = any(
+                self.feasible_cache[suffix[len(stress):]]
+                for stress in stress_index
+                if self.poet.cadence_match(stress, suffix))
+
+        return self.feasible_cache[pattern]
+
+    def moves(self, pattern):
+        '''
+        Returns the stress buckets that match the start of the pattern and
+        leave a feasible remainder, along with their cumulative sizes
+        '''
+
+        if pattern in self.move_cache:
+            return self.move_cache[pattern]
+
+        stress_index = self.poet.stress_index
+
+        buckets = []
+        cum_weights = []
+        total = 0
+
+        for stress in sorted(stress_index):
+            if self.poet.cadence_match(stress, pattern) and \
+                self.feasible(pattern[len(stress):]):
+                total += len(stress_index[stress])
+                buckets.append(stress_index[stress])
+                cum_weights.append(total)
+
+        self.move_cache[pattern] = (buckets, cum_weights)
+        return buckets, cum_weights
+
+    def random_word(self, pattern):
+        '''
+        Returns a random word that fits the start of a feasible pattern
+        and leaves the rest of it feasible
+        '''
+
+        buckets, cum_weights = self.moves(pattern)
+
+        index = random.randrange(cum_weights[-1])
+        bucket = bisect.bisect_right(cum_weights, index)
+        if bucket > 0:
+            index -= cum_weights[bucket - 1]
+
+        return buckets[bucket][index]
+
+    def fill(self, pattern):
+        '''
+        Fills a feasible pattern with words, exactly as given
+        '''
+
+        line = []
+
+        while len(pattern) > 0:
+            word = self.random_word(pattern)
+
+            line.append(word)
+            pattern = pattern[self.poet.nsyl(word):]
+
+        return line
+
+    def generate_stress_line(self, pattern, max_chars=None):
+        '''
+        Generates a line matching a given pattern, or [None] if the
+        pattern cannot be filled
+
+        If given a budget of characters, the line is cut with a None
+        where it no longer fits, see fill_short()
+        '''
+
+        pattern = self.line_pattern(pattern)
+
+        if max_chars is not None:
+            return self.fill_short(pattern, max_chars)
+
+        if not self.feasible(pattern):
+            return [None]
+
+        return self.fill(pattern)
+
+    def usable_rhymes(self, pattern, last_word, restricted=set(), level=None, slant=False):
+        '''
+        Returns the rhymes of the given word that can end a line on the
+        pattern, i.e. the rest of the pattern in front of the rhyme can
+        still be filled
+
+        As in generate_matching_line(), the rhyme does not have to match
+        the ending cadence, but a word never rhymes with itself
+
+        Given a level, only the rhymes at that level are used. With slant,
+        the slant rhymes down to the slant level of the Poet are counted
+        as well, see Poet.loose_rhymes().
+        '''
+
+        key = (pattern, last_word, level, slant)
+
+        if key in self.rhyme_cache:
+            usable = self.rhyme_cache[key]
+
+        else:
+            usable = []
+
+            rhymes = None
+            if last_word.lower() in self.poet.dict:
+                if slant:
+                    rhymes = self.poet.loose_rhymes(last_word)
+                else:
+                    rhymes = self.poet.rhymes(last_word, level)
+
+            # Rhyme sets are sorted already
+            for rhyme_word in rhymes or ():
+                if rhyme_word == last_word:
+                    continue
+
+                num_syl = self.poet.nsyl(rhyme_word)
+                if num_syl > len(pattern):
+                    continue
+
+                if self.feasible(self.line_pattern(pattern[:len(pattern) - num_syl])):
+                    usable.append(rhyme_word)
+
+            # Shared between poems, so must not be modified
+            if len(self.rhyme_cache) >= RHYME_CACHE_SIZE:
+                self.rhyme_cache.clear()
+            self.rhyme_cache[key] = usable
+
+        if len(restricted) > 0:
+            usable = [rhyme_word for rhyme_word in usable if rhyme_word not in restricted]
+
+        return usable
+
+    def short_rhymes(self, rhymes, pattern, max_chars):
+        '''
+        Returns the rhymes that leave room in the budget to fill the
+        pattern in front of them, or all of them if there is no budget
+        '''
+
+        if max_chars is None:
+            return rhymes
+
+        return [rhyme_word for rhyme_word in rhymes 
+            if len(rhyme_word) + self.prefix_chars(pattern, self.poet.nsyl(rhyme_word)) <= max_chars]
+
+    def fitting_rhymes(self, pattern, last_word, num_lines, restricted=set(), max_chars=None):
+        '''
+        Returns the usable rhymes of the word within the budget, falling
+        back on slant rhymes once there are fewer than num_lines of them,
+        see fall_back()
+        '''
+
+        return self.fall_back(last_word, num_lines, lambda level, slant: self.short_rhymes(
+            self.usable_rhymes(pattern, last_word, restricted, level, slant), pattern, max_chars))
+
+    def syllable_rhymes(self, num_syl, last_word, restricted=set()):
+        '''
+        Returns the rhymes of the word outside the restricted set with at
+        most num_syl syllables, falling back on slant rhymes once there
+        are none, see fall_back()
+        '''
+
+        poet = self.poet
+
+        def fitting(level, slant):
+            rhymes = poet.loose_rhymes(last_word) if slant else poet.rhymes(last_word, level)
+            return [rhyme_word for rhyme_word in rhymes or () if rhyme_word != last_word
+                and rhyme_word not in restricted and poet.nsyl(rhyme_word) <= num_syl]
+
+        return self.fall_back(last_word, 1, fitting)
+
+    def fall_back(self, last_word, num_lines, fitting):
+        '''
+        Returns the strict rhymes of the word that fit, given by
+        fitting(level, slant), or once there are fewer than num_lines of
+        them, those at the highest slant level with enough, as Poet.rhyme()
+        falls back on them
+
+        At the slant level of the Poet, the strict rhymes are counted as
+        well, as they are by the feasibility checks (see seed_words()),
+        so a rhyme found feasible is always drawn
+        '''
+
+        rhymes = fitting(None, False)
+
+        if len(rhymes) >= num_lines:
+            return rhymes
+
+        levels = self.poet.slant_levels(last_word)
+        for level in levels:
+            slant = fitting(level, level == levels[-1])
+
+            if len(slant) >= num_lines:
+                self.poet.record('slant')
+                return slant
+
+        return rhymes
+
+    def complete_line(self, pattern, rhyme_word, max_chars=None):
+        '''
+        Fills the pattern in front of a usable rhyme word
+        '''
+
+        num_syl = self.poet.nsyl(rhyme_word)
+
+        # Leave room for the rhyme word and the space in front of it
+        if max_chars is not None:
+            max_chars -= len(rhyme_word) + 1
+
+        line = self.generate_stress_line(pattern[:len(pattern) - num_syl], max_chars)
+        line.append(rhyme_word)
+
+        return line
+
+    def generate_matching_line(self, pattern, last_word, restricted=set(), max_chars=None):
+        '''
+        Generates a line that rhymes with given word and matches the given
+        cadence pattern, or None if there is no such line within the budget
+        '''
+
+        rhymes = self.fitting_rhymes(pattern, last_word, 1, restricted, max_chars)
+
+        if len(rhymes) == 0:
+            return None
+
+        return self.complete_line(pattern, random.choice(rhymes), max_chars)
+
+    def generate_multi_line(self, pattern, last_word, num_lines, max_chars=None):
+        '''
+        Generates the specified number of matching lines, each ending in
+        a different rhyme, or None if there are not enough usable rhymes
+        within the budget of each line
+        '''
+
+        rhymes = self.fitting_rhymes(pattern, last_word, num_lines, max_chars=max_chars)
+
+        if len(rhymes) < num_lines:
+            return None
+
+        return [self.complete_line(pattern, rhyme_word, max_chars)
+            for rhyme_word in random.sample(rhymes, num_lines)]
+
+    def seed_words(self, pattern, min_rhymes):
+        '''
+        Returns the words that can end a line on the pattern and still
+        have at least min_rhymes usable rhymes for further lines on it,
+        counting slant rhymes down to the slant level of the Poet
+        '''
+
+        key = (pattern, min_rhymes)
+        if key in self.seed_cache:
+            return self.seed_cache[key]
+
+        stress_index = self.poet.stress_index
+        line_pattern = self.line_pattern(pattern)
+
+        seeds = []
+
+        for stress in sorted(stress_index):
+
+            # The seed has to fit the end of the line, in front of which
+            # the rest of the line can still be filled
+            if not self.poet.cadence_match(stress, line_pattern, reverse=True):
+                continue
+            if not self.feasible(line_pattern[:len(line_pattern) - len(stress)]):
+                continue
+
+            for word in stress_index[stress]:
+                if len(self.usable_rhymes(pattern, word, slant=True)) >= min_rhymes:
+                    seeds.append(word)
+
+        self.seed_cache[key] = seeds
+        return seeds
+
+    def syllable_seeds(self, num_syl, min_rhymes):
+        '''
+        Returns the words that can end a line of the given number of
+        syllables, and have at least min_rhymes rhymes short enough to
+        end another such line, counting slant rhymes down to the slant
+        level of the Poet
+
+        Whether the rhymes are usable depends on the cadence of the rest
+        of the line, so this is only a necessary condition
+        '''
+
+        key = (num_syl, min_rhymes)
+        if key in self.seed_cache:
+            return self.seed_cache[key]
+
+        poet = self.poet
+        num_fitting = poet.cum_syllables[min(num_syl, len(poet.cum_syllables) - 1)]
+
+        seeds = []
+
+        for word in poet.syllable_words[:num_fitting]:
+            rhymes = poet.loose_rhymes(word) or ()
+
+            # Slant rhymes can be many, so stop counting once there are enough
+            num_rhymes = 0
+            for rhyme_word in rhymes:
+                if rhyme_word != word and poet.nsyl(rhyme_word) <= num_syl:
+                    num_rhymes += 1
+                    if num_rhymes >= min_rhymes:
+                        seeds.append(word)
+                        break
+
+        self.seed_cache[key] = seeds
+        return seeds
+
+    def generate_seed_stress_line(self, pattern, min_rhymes=1, restricted=set(), max_chars=None):
+        '''
+        Generates a line on the pattern backwards from a seed word with
+        at least min_rhymes usable rhymes outside the restricted set, or
+        None if there is no such seed within the budget
+        '''
+
+        if max_chars is None:
+            seeds = self.seed_words(pattern, min_rhymes)
+        else:
+            seeds = self.short_seeds(pattern, min_rhymes, max_chars)
+
+        line_pattern = self.line_pattern(pattern)
+
+        if len(seeds) == 0:
+            return None
+
+        word = random.choice(seeds)
+
+        # The restricted rhymes may leave the seed short, so check the
+        # seeds in random order until one still has enough rhymes
+        if len(restricted) > 0:
+            for word in random.sample(seeds, len(seeds)):
+                if len(self.usable_rhymes(pattern, word, restricted, slant=True)) >= min_rhymes:
+                    break
+            else:
+                return None
+
+        prefix = line_pattern[:len(line_pattern) - self.poet.nsyl(word)]
+
+        if max_chars is None:
+            line = self.fill(prefix)
+        else:
+            line = self.fill_short(prefix, max_chars - len(word) - 1)
+        line.append(word)
+
+        return line
+
+    #########################
+    ### Character budgets ###
+    #########################
+
+    def short_buckets(self):
+        '''
+        Returns the stress buckets with their words sorted by length,
+        as a dictionary of (words, lengths) tuples
+        '''
+
+        if self.short_stress is None:
+            short_stress = {}
+
+            for stress, bucket in self.poet.stress_index.items():
+                words = sorted(bucket, key=len)
+                short_stress[stress] = (words, [len(word) for word in words])
+
+            # Only share the table once it is complete
+            self.short_stress = short_stress
+
+        return self.short_stress
+
+    def short_syllable_buckets(self):
+        '''
+        Returns the words of each number of syllables sorted by length,
+        as a dictionary of (words, lengths) tuples
+        '''
+
+        if self.short_syllables is None:
+            short_syllables = {}
+
+            poet = self.poet
+            for num_syl in range(1, len(poet.cum_syllables)):
+                bucket = poet.syllable_words[poet.cum_syllables[num_syl - 1]:poet.cum_syllables[num_syl]]
+
+                if len(bucket) > 0:
+                    words = sorted(bucket, key=len)
+                    short_syllables[num_syl] = (words, [len(word) for word in words])
+
+            # Only share the table once it is complete
+            self.short_syllables = short_syllables
+
+        return self.short_syllables
+
+    def min_chars(self, pattern):
+        '''
+        Returns the fewest characters the pattern can be filled with,
+        counting the spaces between words, or INFINITY if it cannot be
+        filled at all
+        '''
+
+        if pattern in self.chars_cache:
+            return self.chars_cache[pattern]
+
+        buckets = self.short_buckets()
+
+        # Work back from the end of the pattern, as in feasible()
+        for start in range(len(pattern) - 1, -1, -1):
+            suffix = pattern[start:]
+            if suffix in self.chars_cache:
+                continue
+
+            self.chars_cache[suffix] = min((lengths[0] + self.rest_chars(suffix[len(stress):])
+                for stress, (words, lengths) in buckets.items()
+                if self.poet.cadence_match(stress, suffix)), default=INFINITY)
+
+        return self.chars_cache[pattern]
+
+    def rest_chars(self, pattern):
+        '''
+        Returns the fewest characters needed after a word for the rest of
+        the pattern, including the space in front of it
+        '''
+
+        if len(pattern) == 0:
+            return 0
+
+        return self.min_chars(pattern) + 1
+
+    def prefix_chars(self, pattern, num_syl):
+        '''
+        Returns the fewest characters needed in front of a word of the
+        given number of syllables ending a line on the pattern, as in
+        complete_line(), including the space after them
+        '''
+
+        key = (pattern, num_syl)
+
+        if key not in self.prefix_cache:
+            self.prefix_cache[key] = self.rest_chars(self.line_pattern(pattern[:len(pattern) - num_syl]))
+
+        return self.prefix_cache[key]
+
+    def short_seeds(self, pattern, min_rhymes, max_chars):
+        '''
+        Returns the seed words of seed_words() that leave room in the
+        budget for the rest of the line
+        '''
+
+        key = (pattern, min_rhymes)
+
+        if key not in self.short_seed_cache:
+            line_pattern = self.line_pattern(pattern)
+
+            seeds = sorted((len(word) + self.rest_chars(line_pattern[:len(line_pattern) - self.poet.nsyl(word)]), word)
+                for word in self.seed_words(pattern, min_rhymes))
+
+            self.short_seed_cache[key] = ([word for _, word in seeds], [chars for chars, _ in seeds])
+
+        words, chars = self.short_seed_cache[key]
+        return words[:bisect.bisect_right(chars, max_chars)]
+
+    def short_syllable_seeds(self, num_syl, min_rhymes, max_chars):
+        '''
+        Returns the seed words of syllable_seeds() that leave room in the
+        budget for the rest of the line
+        '''
+
+        key = (num_syl, min_rhymes)
+
+        if key not in self.short_seed_cache:
+            seeds = sorted((len(word) + self.rest_syllable_chars(num_syl - self.poet.nsyl(word)), word)
+                for word in self.syllable_seeds(num_syl, min_rhymes))
+
+            self.short_seed_cache[key] = ([word for _, word in seeds], [chars for chars, _ in seeds])
+
+        words, chars = self.short_seed_cache[key]
+        return words[:bisect.bisect_right(chars, max_chars)]
+
+    def syllable_chars(self, num_syl):
+        '''
+        Returns the fewest characters a line of the given number of
+        syllables can be written with, or INFINITY if there is none
+        '''
+
+        cache = self.syllable_chars_cache
+
+        if len(cache) <= num_syl:
+            buckets = self.short_syllable_buckets()
+
+            # Extend a copy, which is shared once complete, as other
+            # threads may be reading the table
+            cache = list(cache)
+            while len(cache) <= num_syl:
+                n = len(cache)
+                cache.append(min((lengths[0] + (cache[n - k] + 1 if k < n else 0)
+                    for k, (words, lengths) in buckets.items() if k <= n), default=INFINITY))
+
+            self.syllable_chars_cache = cache
+
+        return cache[num_syl]
+
+    def rest_syllable_chars(self, num_syl):
+        '''
+        Returns the fewest characters needed after a word for the rest of
+        a line of the given number of syllables, as in rest_chars()
+        '''
+
+        if num_syl == 0:
+            return 0
+
+        return self.syllable_chars(num_syl) + 1
+
+    def short_word(self, options, max_chars):
+        '''
+        Returns a random word that leaves enough characters for the rest
+        of the line, or None if there is none
+
+        The options are (words, lengths, rest) tuples, where rest is the
+        number of characters needed after a word of the bucket
+        '''
+
+        buckets = []
+        cum_weights = []
+        total = 0
+
+        for words, lengths, rest in options:
+            num_fitting = bisect.bisect_right(lengths, max_chars - rest)
+            if num_fitting > 0:
+                total += num_fitting
+                buckets.append(words)
+                cum_weights.append(total)
+
+        if total == 0:
+            return None
+
+        index = random.randrange(total)
+        bucket = bisect.bisect_right(cum_weights, index)
+        if bucket > 0:
+            index -= cum_weights[bucket - 1]
+
+        return buckets[bucket][index]
+
+    def fill_short(self, pattern, max_chars):
+        '''
+        Fills a pattern with words, exactly as given, within a budget of
+        characters, or cuts the line with a None if it cannot fit
+
+        The line always fits if min_chars() of the pattern is within the
+        budget, as every word leaves room for the rest of the pattern
+        '''
+
+        line = []
+
+        while len(pattern) > 0:
+            if pattern not in self.short_cache:
+                self.short_cache[pattern] = [(words, lengths, self.rest_chars(pattern[len(stress):]))
+                    for stress, (words, lengths) in sorted(self.short_buckets().items())
+                    if self.poet.cadence_match(stress, pattern)]
+
+            word = self.short_word(self.short_cache[pattern], max_chars)
+
+            if word is None:
+                return line + [None]
+
+            line.append(word)
+            max_chars -= len(word) + 1
+            pattern = pattern[self.poet.nsyl(word):]
+
+        return line
+
+    def generate_line(self, num_syl, max_chars):
+        '''
+        Generates a line with given number of syllables within a budget of
+        characters, or cuts the line with a None if it cannot fit
+        '''
+
+        buckets = self.short_syllable_buckets()
+
+        line = []
+
+        while num_syl > 0:
+            options = [(words, lengths, self.rest_syllable_chars(num_syl - k))
+                for k, (words, lengths) in sorted(buckets.items()) if k <= num_syl]
+
+            word = self.short_word(options, max_chars)
+
+            if word is None:
+                return line + [None]
+
+            line.append(word)
+            max_chars -= len(word) + 1
+            num_syl -= self.poet.nsyl(word)
+
+        return line
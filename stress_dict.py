@@ -11,41 +11,130 @@ as well as the Stoel-Gammon Word Complexity Measure (WCM)
 
 Usage:
 ------
-    python3 cmudict_parse.py
+    python3 stress_dict.py [<workers>]
 
-    will write the dictionary to the pickle file 'cmudict.pkl'
+    will write the dictionary to the pickle file 'cmudict.pkl',
+    optionally sharing the work across a number of processes
 '''
 
 import nltk
 from nltk.corpus import cmudict
+from array import array
+import multiprocessing
 import pickle
 import sys
 
+from corpus import printProgress
+
 import os
 path = os.getcwd()
 
-# Print iterations progress
-def printProgress (iteration, total, prefix = '', suffix = '', decimals = 1, barLength = 100):
+# Constant phoneme classses
+VELARS = set("K G NG".split())
+LIQUIDS = set("L R".split())
+VOICED_AF = set("V DH Z ZH".split())
+AF = set("F TH S SH CH".split()) | VOICED_AF
+
+# Number of chunks handed to each worker process
+CHUNKS_PER_WORKER = 16
+
+# Read-only phoneme arrays shared with the worker processes
+# When processes are forked, these pages are shared rather than copied
+shared = None
+
+def share(phonemes, offsets, stresses, points):
+    '''
+    Sets the phoneme arrays shared with a worker process
+    '''
+
+    global shared
+    shared = (phonemes, offsets, stresses, points)
+
+def encode(pronunciations):
     '''
-    Call in a loop to create terminal progress bar
-    @params:
-        iteration   - Required  : current iteration (Int)
-        total       - Required  : total iterations (Int)
-        prefix      - Optional  : prefix string (Str)
-        suffix      - Optional  : suffix string (Str)
-        decimals    - Optional  : positive number of decimals in percent complete (Int)
-        barLength   - Optional  : character length of bar (Int)
-    
-    Credit: http://stackoverflow.com/a/34325723
+    Encodes pronunciations into one flat array of phoneme codes, with
+    the offset of each pronunciation in a second array
+
+    Also returns, for each phoneme code, its stress marker ('' for
+    consonants) and the points it scores in the WCM sound classes
     '''
-    formatStr       = "{0:." + str(decimals) + "f}"
-    percents        = formatStr.format(100 * (iteration / float(total)))
-    filledLength    = int(round(barLength * iteration / float(total)))
-    bar             = '█' * filledLength + '-' * (barLength - filledLength)
-    sys.stdout.write('\r%s |%s| %s%s %s' % (prefix, bar, percents, '%', suffix)),
-    if iteration == total:
-        sys.stdout.write('\n')
-    sys.stdout.flush()
+
+    codes = {}
+    phonemes = array('H')
+    offsets = array('I', [0])
+
+    for pronunciation in pronunciations:
+        for phoneme in pronunciation:
+            if phoneme not in codes:
+                codes[phoneme] = len(codes)
+            phonemes.append(codes[phoneme])
+        offsets.append(len(phonemes))
+
+    stresses = [''] * len(codes)
+    points = [0] * len(codes)
+
+    for phoneme, code in codes.items():
+        if phoneme[-1] == '0' or phoneme[-1] == '1' or phoneme[-1] == '2':
+            stresses[code] = phoneme[-1]
+
+        points[code] = (phoneme in VELARS) + (phoneme in LIQUIDS) + \
+            (phoneme in VOICED_AF) + (phoneme in AF)
+
+    return phonemes, offsets, stresses, points
+
+def score_range(bounds):
+    '''
+    Computes the (stress, complexity) tuple of the encoded pronunciations
+    in the given range, as cmudict_parser.stress() and complexity() do
+    for a single word
+    '''
+
+    phonemes, offsets, stresses, points = shared
+    start, end = bounds
+
+    results = []
+
+    for i in range(start, end):
+        codes = phonemes[offsets[i]:offsets[i + 1]]
+
+        stress_pattern = ''.join(stresses[code] for code in codes)
+
+        # Count the syllable clusters of more than two phonemes
+        # Trailing consonants belong to the last syllable
+        clusters = 0
+        length = 0
+        last = 0
+        num_syls = 0
+        for code in codes:
+            length += 1
+            if stresses[code]:
+                clusters += length > 2
+                last = length
+                num_syls += 1
+                length = 0
+        if length > 0:
+            if num_syls > 0:
+                clusters += (last + length > 2) - (last > 2)
+            else:
+                clusters += length > 2
+
+        # Score as in complexity(), where a word-final consonant
+        # always receives its point
+        score = (len(stress_pattern) > 2) + 1 + clusters + sum(points[code] for code in codes)
+        if '1' in stress_pattern[1:] or '2' in stress_pattern[1:]:
+            score += 1
+
+        # One syllable words are neither stressed nor unstressed
+        if len(stress_pattern) == 1:
+            stress_pattern = '*'
+
+        # Some words have no syllables
+        if len(stress_pattern) == 0:
+            results.append((stress_pattern, 100.0))
+        else:
+            results.append((stress_pattern, score / len(stress_pattern)))
+
+    return results
 
 class cmudict_parser(object):
 
@@ -90,12 +179,6 @@ class cmudict_parser(object):
         stress_pattern = self.stress(word)
         syllables = self.syllables(word)
 
-        # Constant phoneme classses
-        VELARS = set("K G NG".split())
-        LIQUIDS = set("L R".split())
-        VOICED_AF = set("V DH Z ZH".split())
-        AF = set("F TH S SH CH".split()) | VOICED_AF
-
         score = 0
 
         # WORD PATTERNS
@@ -169,27 +252,60 @@ class cmudict_parser(object):
 
         return syls
 
-    def write(self):
+    def write(self, workers=1):
         '''
         Write to a dictionary containing the words as keys and stresses
         as values
+
+        Rather than calling stress() and complexity() for every word, the
+        primary pronunciations are all encoded into phoneme codes once, 
+        and scored in chunks, which are shared across the given number of
+        worker processes
         '''
         ret_dict = {}
 
         print("Writing to " + path + "/data/cmudict.pkl...")
+
+        words = list(self.dict)
+        encoded = encode(self.dict[word][0] for word in words)
+
+        # Split the words into chunks
+        num_chunks = max(workers, 1) * CHUNKS_PER_WORKER
+        chunk_size = max(len(words) // num_chunks, 1)
+        chunks = [(i, min(i + chunk_size, len(words))) for i in range(0, len(words), chunk_size)]
+
         count = 0
-        printProgress(count, len(self.dict), prefix = 'Progress:', suffix = 'Complete', barLength = 50)
+        printProgress(count, max(len(words), 1), prefix = 'Progress:', suffix = 'Complete', barLength = 50)
+
+        if workers > 1:
+            pool = multiprocessing.Pool(workers, initializer=share, initargs=encoded)
+            results = pool.imap(score_range, chunks)
+        else:
+            pool = None
+            share(*encoded)
+            results = map(score_range, chunks)
+
+        for (start, end), scores in zip(chunks, results):
+            for word, entry in zip(words[start:end], scores):
+                ret_dict[word] = entry
+
+            # Show progress once per chunk
+            count += end - start
+            printProgress(count, len(words), prefix = 'Progress:', suffix = 'Complete', barLength = 50)
 
-        for word in self.dict:
-            stress = self.stress(word)
-            ret_dict[word] = (stress, self.complexity(word))
-            count += 1
-            printProgress(count, len(self.dict), prefix = 'Progress:', suffix = 'Complete', barLength = 50)
+        if pool is not None:
+            pool.close()
+            pool.join()
 
         pickle.dump( ret_dict, open(path + '/data/cmudict.pkl', 'wb') )
 
         return ret_dict
 
 if __name__ == '__main__':
+    try:
+        workers = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    except:
+        print('Usage: python3 stress_dict.py [<workers>]')
+        sys.exit(1)
     parser = cmudict_parser()
-    parser.write()
\ No newline at end of file
+    parser.write(workers)
\ No newline at end of file
@@ -0,0 +1,131 @@
+'''
+Small random pronunciation dictionaries in the format of the CMU
+dictionary, for checking the rhyming code against a full scan
+'''
+
+import os
+import pickle
+import random
+
+VOWELS = ['AA', 'AE', 'AH', 'EH', 'IY', 'OW']
+CONSONANTS = ['B', 'D', 'K', 'L', 'N', 'S', 'T']
+
+def pronunciation(rng):
+    '''
+    Returns a random pronunciation of one to six phonemes
+    '''
+
+    pron = []
+    for _ in range(rng.randint(1, 6)):
+        if rng.random() < 0.4:
+            pron.append(rng.choice(VOWELS) + rng.choice('012'))
+        else:
+            pron.append(rng.choice(CONSONANTS))
+    return pron
+
+def word_name(i):
+    '''
+    Returns a made-up word of letters for the number, in the same sorted
+    order as the numbers
+    '''
+
+    letters = ''
+    for _ in range(3):
+        i, digit = divmod(i, 26)
+        letters = chr(ord('a') + digit) + letters
+    return 'w' + letters
+
+def pron_dict(num_words=300, seed=0):
+    '''
+    Returns a dictionary mapping made-up words to lists of
+    pronunciations, with some homophones and some words with several
+    pronunciations
+    '''
+
+    rng = random.Random(seed)
+    prons = {}
+
+    for i in range(num_words):
+        prons[word_name(i)] = [pronunciation(rng)]
+
+    words = sorted(prons)
+    for word in rng.sample(words, num_words // 10):
+        prons[word].append(pronunciation(rng))
+    for word in rng.sample(words, num_words // 10):
+        prons[word].append(list(prons[rng.choice(words)][0]))
+    for word in rng.sample(words, num_words // 20):
+        prons[word].append(list(prons[word][0]))
+
+    return prons
+
+def strip(pron):
+    return [''.join(letter for letter in phoneme if letter.isalpha()).lower() for phoneme in pron]
+
+def scan_rhymes(word, level, word_list, prons):
+    '''
+    Returns the rhymes of the word at the given level by scanning the
+    whole word list, as rhymer.rhyme_set() does
+    '''
+
+    rhymes = set()
+    for syllable in map(strip, prons[word]):
+        for other in word_list:
+            for pron in map(strip, prons[other]):
+                if pron[-level:] == syllable[-level:] and pron != syllable:
+                    rhymes.add(other)
+    return rhymes
+
+def optimal_level(word, prons):
+    num_elements = len(prons[word][0])
+    return num_elements if num_elements < 4 else num_elements - 1
+
+def stress_dict(prons):
+    '''
+    Returns the stress dictionary of the words with at least one syllable,
+    in the format of stress_dict.py
+    '''
+
+    stresses = {}
+    for word, word_prons in prons.items():
+        stress = ''.join(phoneme[-1] for phoneme in word_prons[0] if phoneme[-1] in '012')
+        if len(stress) == 1:
+            stress = '*'
+        if len(stress) > 0:
+            stresses[word] = (stress, len(word_prons[0]) / len(stress))
+    return stresses
+
+def write_corpus(directory, prons, word_list=None):
+    '''
+    Writes a corpus of the words, with its rhyming dictionary and the
+    stress dictionary, to the directory, to load a Poet from with the
+    module path of poetry.py set to it, and returns the corpus file
+    '''
+
+    # Imported here, so that the pronunciations alone need no package imports
+    from rhyme_index import build_rhyme_classes
+
+    stresses = stress_dict(prons)
+    words = sorted(word for word in (word_list or prons) if word in stresses)
+
+    os.makedirs(os.path.join(directory, 'data'), exist_ok=True)
+    with open(os.path.join(directory, 'data', 'cmudict.pkl'), 'wb') as f:
+        pickle.dump(stresses, f)
+
+    filename = os.path.join(directory, 'data', 'corpus.txt')
+    with open(filename, 'w') as f:
+        f.write(' '.join(words))
+    with open(os.path.join(directory, 'data', 'corpus.pkl'), 'wb') as f:
+        pickle.dump(build_rhyme_classes(words, prons), f)
+
+    return filename
+
+def load_poet(directory, filename, **kwargs):
+    '''
+    Returns a Poet of the corpus written by write_corpus() to the directory
+    '''
+
+    from unittest import mock
+    import poetry
+
+    with mock.patch.object(poetry, 'path', directory):
+        return poetry.Poet(filename, **kwargs)
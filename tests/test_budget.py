@@ -0,0 +1,163 @@
+import asyncio
+import random
+import tempfile
+import threading
+import unittest
+from concurrent.futures import CancelledError
+from unittest import mock
+
+from budget import Budget, BudgetExceeded
+from prons import load_poet, pron_dict, write_corpus
+
+class TestBudget(unittest.TestCase):
+
+    def test_attempts(self):
+        budget = Budget(attempts=2)
+        budget.spend()
+        budget.spend(retry=True)
+
+        with self.assertRaises(BudgetExceeded) as exceeded:
+            budget.spend(retry=True)
+
+        e = exceeded.exception
+        self.assertEqual(e.reason, 'Out of attempts')
+        self.assertEqual(e.attempts, 3)
+        self.assertGreaterEqual(e.elapsed, 0)
+        self.assertEqual(e.args, (e.reason, e.attempts, e.elapsed))
+        self.assertEqual(budget.retries, 2)
+
+    def test_seconds(self):
+        with mock.patch('budget.time.monotonic', side_effect=[100.0, 100.5, 102.0, 102.0]):
+            budget = Budget(seconds=1)
+            budget.spend()
+
+            with self.assertRaises(BudgetExceeded) as exceeded:
+                budget.spend()
+
+        e = exceeded.exception
+        self.assertEqual(e.reason, 'Out of time')
+        self.assertEqual(e.attempts, 2)
+        self.assertEqual(e.elapsed, 2.0)
+
+    def test_unlimited(self):
+        budget = Budget()
+        for _ in range(1000):
+            budget.spend(retry=True)
+
+        self.assertEqual(budget.attempts, 1000)
+
+    def test_cancel(self):
+        cancel = threading.Event()
+        budget = Budget(attempts=10, cancel=cancel)
+        budget.spend()
+
+        cancel.set()
+        with self.assertRaises(CancelledError):
+            budget.spend()
+
+class TestPoetBudget(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.filename = write_corpus(cls.directory.name, pron_dict(seed=1))
+        cls.poet = load_poet(cls.directory.name, cls.filename)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def tearDown(self):
+        if 'checkpoint' in vars(self.poet):
+            del self.poet.checkpoint
+
+        if self.poet.executor is not None:
+            self.poet.executor.shutdown(wait=True)
+            self.poet.executor = None
+
+    def test_out_of_attempts(self):
+        random.seed(0)
+
+        with self.assertRaises(BudgetExceeded) as exceeded:
+            with self.poet.budget(attempts=1):
+                self.poet.string_limerick()
+
+        self.assertEqual(exceeded.exception.attempts, 2)
+
+        # The budget only holds within the block
+        self.assertIsNone(getattr(self.poet.local, 'budget', None))
+        self.poet.string_limerick()
+
+        with self.assertRaises(BudgetExceeded) as exceeded:
+            asyncio.run(self.poet.acompose('limerick', attempts=1))
+
+        self.assertEqual(exceeded.exception.attempts, 2)
+
+    def test_nested_budgets(self):
+        with self.poet.budget(attempts=100) as outer:
+            with self.poet.budget(attempts=100) as inner:
+                self.poet.checkpoint()
+
+            self.poet.checkpoint()
+
+        self.assertEqual((outer.attempts, inner.attempts), (1, 1))
+
+    def stop_at(self, num_calls, cancel):
+        '''
+        Sets the cancel event at the given call to checkpoint(), returning
+        the list of calls made
+        '''
+
+        calls = []
+        checkpoint = self.poet.checkpoint
+
+        def cancelling(event='retry'):
+            calls.append(event)
+            if len(calls) == num_calls:
+                cancel()
+            checkpoint(event)
+
+        self.poet.checkpoint = cancelling
+        return calls
+
+    def test_cancel_at_checkpoint(self):
+        random.seed(0)
+        cancel = threading.Event()
+        calls = self.stop_at(3, cancel.set)
+
+        with self.assertRaises(CancelledError):
+            self.poet.compose_cancellable('limerick', cancel)
+
+        self.assertEqual(len(calls), 3)
+
+    def test_cancel_task(self):
+        random.seed(0)
+        started = threading.Event()
+        resume = threading.Event()
+
+        # Hold the composition at its first checkpoint until the task
+        # has been cancelled
+        def wait():
+            started.set()
+            resume.wait(10)
+
+        calls = self.stop_at(1, wait)
+
+        async def cancel_task():
+            task = asyncio.ensure_future(self.poet.acompose('limerick'))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 10)
+
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_task())
+
+        # The composition stops at the checkpoint it was held at
+        resume.set()
+        self.poet.executor.shutdown(wait=True)
+
+        self.assertEqual(len(calls), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import itertools
+import types
+import unittest
+
+from poetry import Poet
+
+def recursive_match(cad, pattern, reverse=False):
+    '''
+    The recursive cadence_match() that the memoized one replaced
+    '''
+
+    if len(cad) == 0:
+        return True
+    elif len(pattern) == 0:
+        return False
+
+    if reverse:
+        if cad[-1] == pattern[-1] or cad[-1] == '0' and pattern[-1] == '*':
+            return recursive_match(cad[:-1], pattern[:-1], reverse=True)
+        return False
+    else:
+        if cad[0] == pattern[0] or cad[0] == '0' and pattern[0] == '*':
+            return recursive_match(cad[1:], pattern[1:])
+        return False
+
+def strings(alphabet, max_length):
+    for length in range(max_length + 1):
+        for letters in itertools.product(alphabet, repeat=length):
+            yield ''.join(letters)
+
+class TestCadenceMatch(unittest.TestCase):
+
+    def test_matches_recursive(self):
+        poet = types.SimpleNamespace(cadence_cache={})
+        cadences = list(strings('012*', 4))
+        patterns = list(strings('01*', 5))
+
+        # Twice, so the second pass is answered from the memo
+        for _ in range(2):
+            for pattern in patterns:
+                for cad in cadences:
+                    for reverse in (False, True):
+                        self.assertEqual(Poet.cadence_match(poet, cad, pattern, reverse),
+                            recursive_match(cad, pattern, reverse), (cad, pattern, reverse))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import os
+import tempfile
+import unittest
+
+from corpus import chunks, vocabulary
+
+class TestChunks(unittest.TestCase):
+
+    def write(self, text):
+        file = tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False)
+        file.write(text)
+        file.close()
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def test_words_not_split(self):
+        filename = self.write('roses are red\nviolets are blue ' * 50)
+        for text in chunks(filename, chunk_size=16):
+            self.assertTrue(text[-1].isspace() or text.endswith('blue'), text)
+
+        self.assertEqual(vocabulary(filename, {'roses', 'red', 'blue'}, chunk_size=16),
+            {'roses', 'red', 'blue'})
+
+    def test_carry_over_bounded(self):
+        filename = self.write('x' * 10000 + ' red')
+        sizes = [len(text) for text in chunks(filename, chunk_size=64)]
+
+        self.assertEqual(sum(sizes), 10004)
+        self.assertLess(max(sizes), 2 * 64)
+        self.assertEqual(vocabulary(filename, {'red'}, chunk_size=64), {'red'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+import farm
+from budget import BudgetExceeded, CompositionFailed
+
+class FakePoet(object):
+    '''
+    Stands in for the Poet shared with the workers
+    '''
+
+    def __init__(self, error=None):
+        self.error = error
+
+    def budget(self, seconds=None, attempts=None, cancel=None):
+        return Budget()
+
+    def compose(self, form):
+        if self.error is not None:
+            raise self.error
+        return 'a ' + form
+
+class Budget(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+class TestComposeRequest(unittest.TestCase):
+
+    def tearDown(self):
+        farm.share(None)
+
+    def test_poem(self):
+        farm.share(FakePoet())
+        self.assertEqual(farm.compose_request((3, 'haiku', 10)), (3, 'haiku', 'a haiku'))
+
+    def test_failed_poems_are_none(self):
+        for error in (BudgetExceeded('Out of time', 10, 1.0),
+                CompositionFailed('No seed line with enough rhymes', 8, 5)):
+            farm.share(FakePoet(error))
+            self.assertEqual(farm.compose_request((0, 'ballade', 10)), (0, 'ballade', None))
+
+    def test_other_errors_are_raised(self):
+        farm.share(FakePoet(KeyError('word')))
+        with self.assertRaises(KeyError):
+            farm.compose_request((0, 'ballade', 10))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import random
+import unittest
+from unittest import mock
+
+import lang_utils
+from prons import optimal_level, pron_dict, scan_rhymes
+
+class TestLangUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.prons = pron_dict(seed=5)
+        self.words = sorted(random.Random(5).sample(sorted(self.prons), 200))
+
+        # Draw on the made-up pronunciations rather than the CMU dictionary
+        lang_utils.init()
+        lang_utils.loaded.update(p_dict=self.prons, word_list=self.words, lexicon=None)
+
+    def tearDown(self):
+        lang_utils.init()
+        lang_utils.loaded.clear()
+
+    def test_rhyme_set_matches_full_scan(self):
+        for word in sorted(self.prons)[:100]:
+            for level in (1, 2, 3):
+                self.assertEqual(lang_utils.rhyme_set(word, level),
+                    scan_rhymes(word, level, self.words, self.prons), (word, level))
+
+            self.assertEqual(lang_utils.rhyme(word),
+                scan_rhymes(word, optimal_level(word, self.prons), self.words, self.prons), word)
+
+    def test_batch_matches_single_words(self):
+        tokens = self.words[:50] * 2 + ['missing']
+        batches = [
+            (lang_utils.stress_many, lang_utils.stress),
+            (lang_utils.syllables_many, lang_utils.syllables),
+            (lang_utils.complexity_many, lang_utils.complexity),
+            (lang_utils.rhyme_many, lang_utils.rhyme),
+            (lambda words: lang_utils.rhyme_set_many(words, 2), lambda word: lang_utils.rhyme_set(word, 2)),
+        ]
+
+        for many, single in batches:
+            results = many(tokens)
+            self.assertEqual(set(results), set(tokens))
+            self.assertIsNone(results['missing'])
+
+            # Compare with the words looked up one at a time, afresh
+            lang_utils.memos.clear()
+            for word in self.words[:50]:
+                self.assertEqual(results[word], single(word), (many, word))
+
+    def test_rhyme_sets_are_copies(self):
+        word = next(word for word in self.words if len(lang_utils.rhyme(word)) > 0)
+        rhymes = lang_utils.rhyme(word)
+
+        for result in (lang_utils.rhyme(word), lang_utils.rhyme_set(word, 1), lang_utils.rhyme_many([word])[word]):
+            self.assertIsInstance(result, set)
+            result.clear()
+
+        self.assertEqual(lang_utils.rhyme(word), rhymes)
+        self.assertIsInstance(lang_utils.shared_rhyme_set(word, 1), frozenset)
+
+    def test_memos_are_bounded(self):
+        stresses = lang_utils.stress_many(self.words[:50])
+        lang_utils.memos.clear()
+
+        with mock.patch.object(lang_utils, 'MEMO_SIZE', 10):
+            for _ in range(2):
+                for word in self.words[:50]:
+                    self.assertEqual(lang_utils.stress(word), stresses[word])
+                    self.assertLessEqual(len(lang_utils.memos['stress']), 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import random
+import tempfile
+import unittest
+
+from lexicon import Lexicon, write_lexicon
+from prons import pron_dict
+from rhyme_index import build_rhyme_classes
+from rhyme_set import RhymeClasses
+
+class TestLexiconRhymes(unittest.TestCase):
+
+    def check(self, corpus):
+        prons = pron_dict()
+        rhyme_dict = RhymeClasses(build_rhyme_classes(sorted(prons), prons))
+        stress_dict = {word: ('1' * len(word_prons[0]), 1.0) for word, word_prons in prons.items()}
+
+        with tempfile.TemporaryDirectory() as directory:
+            out_file = os.path.join(directory, 'test.lex')
+            write_lexicon(out_file, stress_dict, rhyme_dict, corpus)
+            lexicon = Lexicon(out_file)
+
+            # The rhymes of each word, as far as the lexicon holds them
+            expected = {}
+            for word in lexicon:
+                rhymes = set(other for other in rhyme_dict.get(word, ()) if other in lexicon)
+                if len(rhymes) > 0:
+                    expected[word] = rhymes
+
+            view = lexicon.rhyme_dict
+            self.assertEqual(dict(view.items()), expected)
+            self.assertEqual(len(view), len(expected))
+            for word, rhymes in expected.items():
+                self.assertEqual(set(view.rhyme_set(word)), rhymes, word)
+
+    def test_full(self):
+        self.check(None)
+
+    def test_bundle(self):
+        words = sorted(pron_dict())
+        self.check(random.Random(0).sample(words, 120))
+
+if __name__ == '__main__':
+    unittest.main()
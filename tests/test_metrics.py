@@ -0,0 +1,104 @@
+import json
+import random
+import tempfile
+import unittest
+
+from metrics import Metrics
+from prons import load_poet, pron_dict, write_corpus
+
+# Counters documented in metrics.py
+COUNTERS = set(['line', 'draws', 'retry', 'restart', 'slant', 'rejected.rhyme',
+    'rejected.syllables', 'rejected.cadence', 'rejected.length'])
+
+class TestMetrics(unittest.TestCase):
+
+    def test_export(self):
+        metrics = Metrics()
+        metrics.count('retry')
+        metrics.count('draws', 5)
+        metrics.time('line', 0.25)
+        metrics.time('line', 0.5)
+
+        self.assertEqual(metrics.export(), {
+            'counts': {'draws': 5, 'retry': 1},
+            'stages': {'line': {'calls': 2, 'seconds': 0.75}},
+        })
+
+        metrics.reset()
+        self.assertEqual(metrics.export(), {'counts': {}, 'stages': {}})
+
+class TestPoetMetrics(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.filename = write_corpus(cls.directory.name, pron_dict(seed=1))
+        cls.poet = load_poet(cls.directory.name, cls.filename)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_only_within_measure(self):
+        poet = self.poet
+        metrics = Metrics()
+
+        # Nothing is gathered outside of the block, even into given metrics
+        random.seed(0)
+        poet.string_limerick()
+        poet.record('retry')
+        poet.record_line(['a', None])
+        self.assertIsNone(getattr(poet.local, 'metrics', None))
+        self.assertEqual(metrics.export(), {'counts': {}, 'stages': {}})
+
+        with poet.measure(metrics) as measured:
+            self.assertIs(measured, metrics)
+            random.seed(0)
+            poet.string_limerick()
+
+        exported = metrics.export()
+        self.assertGreater(exported['counts']['line'], 0)
+
+        poet.string_limerick()
+        poet.record('retry')
+        self.assertEqual(metrics.export(), exported)
+
+    def test_export(self):
+        poet = self.poet
+
+        with poet.measure() as metrics:
+            random.seed(0)
+            poet.string_limerick()
+            poet.record_line(['a', 'b', None], max_chars=10)
+
+        exported = metrics.export()
+        self.assertEqual(set(exported), set(['counts', 'stages']))
+        self.assertTrue(set(exported['counts']) <= COUNTERS, exported['counts'])
+        self.assertGreater(exported['counts']['line'], 0)
+        self.assertGreater(exported['counts']['draws'], 0)
+        self.assertEqual(exported['counts']['rejected.length'], 1)
+
+        for stage, timing in exported['stages'].items():
+            self.assertEqual(set(timing), set(['calls', 'seconds']))
+            self.assertGreater(timing['calls'], 0)
+            self.assertGreaterEqual(timing['seconds'], 0)
+        self.assertEqual(exported['stages']['compose_limerick']['calls'], 1)
+
+        # Written as JSON, as the docstring of export() promises
+        self.assertEqual(json.loads(json.dumps(exported)), exported)
+
+    def test_nested_measures(self):
+        poet = self.poet
+        total = Metrics()
+
+        for seed in range(3):
+            with poet.measure(total):
+                with poet.measure() as inner:
+                    poet.record('restart')
+                poet.record('restart')
+
+        self.assertEqual(inner.counts, {'restart': 1})
+        self.assertEqual(total.counts, {'restart': 3})
+
+if __name__ == '__main__':
+    unittest.main()
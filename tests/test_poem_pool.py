@@ -0,0 +1,102 @@
+import contextlib
+import threading
+import time
+import unittest
+
+import poem_pool
+from budget import CompositionFailed
+from poem_pool import PoemPool
+
+class FakePoet(object):
+    '''
+    Stands in for a Poet, whose only part used by the pool is budget()
+    '''
+
+    FORMS = ()
+
+    @contextlib.contextmanager
+    def budget(self, seconds=None, attempts=None, cancel=None):
+        yield None
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+class TestPoemPool(unittest.TestCase):
+
+    def setUp(self):
+        self.delay = poem_pool.RETRY_DELAY
+        poem_pool.RETRY_DELAY = 0.01
+
+    def tearDown(self):
+        poem_pool.RETRY_DELAY = self.delay
+
+    def test_refill(self):
+        with PoemPool(FakePoet(), low=2, high=4, makers={'haiku': lambda: 'poem'}) as pool:
+            self.assertTrue(wait_for(lambda: len(pool.poems['haiku']) == 4))
+            for _ in range(3):
+                self.assertEqual(pool.pop('haiku'), 'poem')
+            self.assertEqual(pool.pop('random'), 'poem')
+            self.assertTrue(wait_for(lambda: len(pool.poems['haiku']) == 4))
+
+    def test_failing_maker(self):
+        calls = []
+        lock = threading.Lock()
+
+        def flaky():
+            with lock:
+                calls.append(None)
+                if len(calls) <= 3:
+                    raise ValueError('No words in corpus with enough rhymes')
+            return 'flaky poem'
+
+        makers = {'flaky': flaky, 'haiku': lambda: 'poem'}
+
+        with self.assertLogs('poem_pool', level='ERROR') as logs:
+            with PoemPool(FakePoet(), low=2, high=4, makers=makers) as pool:
+                self.assertTrue(wait_for(lambda: len(pool.poems['flaky']) == 4))
+                self.assertTrue(wait_for(lambda: len(pool.poems['haiku']) == 4))
+                self.assertTrue(pool.thread.is_alive())
+                self.assertEqual(pool.failures['flaky'], 0)
+
+        self.assertEqual(len(logs.records), 3)
+        self.assertFalse(pool.thread.is_alive())
+
+    def test_unlucky_poem(self):
+        calls = []
+
+        def unlucky():
+            calls.append(None)
+            if len(calls) == 1:
+                raise CompositionFailed('No seed line with enough rhymes', 8, 5)
+            return 'poem'
+
+        with self.assertLogs('poem_pool', level='WARNING') as logs:
+            with PoemPool(FakePoet(), low=2, high=4, makers={'ballade': unlucky}) as pool:
+                self.assertTrue(wait_for(lambda: len(pool.poems['ballade']) == 4))
+
+        self.assertEqual([record.levelname for record in logs.records], ['WARNING'])
+        self.assertIn('No seed line with enough rhymes', logs.output[0])
+
+    def test_always_failing_maker(self):
+        def broken():
+            raise KeyError('word')
+
+        makers = {'broken': broken, 'haiku': lambda: 'poem'}
+
+        with self.assertLogs('poem_pool', level='ERROR'):
+            with PoemPool(FakePoet(), low=2, high=4, makers=makers) as pool:
+                self.assertTrue(wait_for(lambda: pool.failures['broken'] >= 3))
+                self.assertTrue(wait_for(lambda: len(pool.poems['haiku']) == 4))
+                self.assertTrue(pool.thread.is_alive())
+
+                # Served on the spot while the pool cannot refill it
+                with self.assertRaises(KeyError):
+                    pool.pop('broken')
+
+if __name__ == '__main__':
+    unittest.main()
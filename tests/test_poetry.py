@@ -0,0 +1,110 @@
+import random
+import tempfile
+import unittest
+
+from budget import CompositionFailed
+from prons import load_poet, pron_dict, write_corpus
+
+class TestSeedLines(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.filename = write_corpus(cls.directory.name, pron_dict(seed=2))
+        cls.poet = load_poet(cls.directory.name, cls.filename)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_seed_line(self):
+        random.seed(0)
+        line = self.poet.generate_seed_line(8, min_rhymes=2)
+
+        self.assertEqual(sum(map(self.poet.nsyl, line)), 8)
+        self.assertTrue(self.poet.enough_rhymes(line, 2))
+
+    def test_no_seed_words(self):
+        with self.assertRaises(CompositionFailed):
+            self.poet.generate_seed_line(8, min_rhymes=len(self.poet.word_list))
+
+    def test_no_seed_line(self):
+        # Seed words with enough rhymes of the right length, none of which
+        # fit the cadence of any line, so every seed is given up on
+        poet = self.poet
+        poet.enough_rhymes = lambda line, min_rhymes=1: False
+
+        try:
+            with self.assertRaises(CompositionFailed) as failed:
+                poet.generate_seed_line(8, num_seeds=5)
+            self.assertIsInstance(failed.exception, ValueError)
+        finally:
+            del poet.enough_rhymes
+
+class TestCharacterBudget(unittest.TestCase):
+
+    # The forms tweeted by tweet.py, and the characters allowed in a tweet
+    FORMS = ['limerick', 'haiku', 'love_poem', 'doublet', 'quatrain']
+    MAX_CHARS = 140
+
+    @classmethod
+    def setUpClass(cls):
+        prons = pron_dict(seed=1)
+
+        # The opening words of a love poem
+        prons.update(roses=[['R', 'OW1', 'Z', 'IH0', 'Z']], are=[['AA1', 'R']],
+            red=[['R', 'EH1', 'D']], violets=[['V', 'AY1', 'AH0', 'L', 'AH0', 'T', 'S']])
+
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.filename = write_corpus(cls.directory.name, prons)
+        cls.poet = load_poet(cls.directory.name, cls.filename)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_line_budget(self):
+        poet = self.poet
+
+        self.assertIsNone(poet.line_budget(None, [], [5, 7, 5]))
+
+        # The newlines between the lines count against the budget
+        self.assertEqual(poet.line_budget(140, [], [5, 7, 5]), 141 * 5 // 17 - 1)
+        self.assertEqual(poet.line_budget(140, [['ab', 'cd']], [7, 5]), (141 - 6) * 7 // 12 - 1)
+        self.assertEqual(poet.line_budget(140, [['ab', 'cd'], ['efg']], [5]), 140 - 6 - 4)
+
+        # Left out lines take up nothing, cut lines only their words
+        self.assertEqual(poet.line_budget(140, [None, ['ab', None]], [5]), 140 - 3)
+
+        # The shares of the lines add up to no more than the budget
+        for max_chars in range(20, 200, 7):
+            sizes = [8, 5, 5, 8]
+            shares = []
+            for i in range(len(sizes)):
+                shares.append(poet.line_budget(max_chars, [['x' * share] for share in shares], sizes[i:]))
+            self.assertLessEqual(sum(shares) + len(sizes) - 1, max_chars)
+
+    def test_poems_fit(self):
+        # With a budget, lines are always composed by the solver
+        poet = self.poet
+
+        for form in self.FORMS:
+            compose = getattr(poet, 'compose_' + form)
+
+            for max_chars in (self.MAX_CHARS, 80, 50):
+                for seed in range(10):
+                    random.seed(seed)
+                    with poet.budget(attempts=20000):
+                        poem = compose(max_chars=max_chars)
+
+                    # Cut or left out lines are composed again by tweet.py,
+                    # but what there is of them still fits
+                    lines = [' '.join(word for word in line if word is not None)
+                        for line in poem if line is not None]
+                    self.assertLessEqual(len('\n'.join(lines)), max_chars, (form, max_chars, seed))
+
+                    if max_chars == self.MAX_CHARS:
+                        self.assertTrue(all(line is not None and None not in line for line in poem))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+
+from prons import optimal_level, pron_dict, scan_rhymes
+from rhyme_index import build_rhyme_sets
+
+class TestBuildRhymeSets(unittest.TestCase):
+
+    def test_matches_full_scan(self):
+        for seed in range(3):
+            prons = pron_dict(seed=seed)
+            words = sorted(prons)
+            rhyme_sets = build_rhyme_sets(words, prons)
+
+            for word in words:
+                expected = scan_rhymes(word, optimal_level(word, prons), words, prons)
+                self.assertEqual(rhyme_sets.get(word, set()), expected, word)
+                self.assertNotEqual(rhyme_sets.get(word), set(), word)
+
+    def test_explicit_levels(self):
+        prons = pron_dict(seed=3)
+        words = sorted(prons)[:150]
+        levels = {word: 2 for word in words}
+        rhyme_sets = build_rhyme_sets(words, prons, levels)
+
+        for word in words:
+            self.assertEqual(rhyme_sets.get(word, set()), scan_rhymes(word, 2, words, prons), word)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import random
+import unittest
+
+from rhyme_set import REJECTION_TRIES, RhymeSet
+
+class TestRhymeSet(unittest.TestCase):
+
+    def setUp(self):
+        self.words = ['w%02d' % i for i in range(20)]
+        self.excluded = set(self.words[:3])
+        self.rhymes = RhymeSet(reversed(self.words), self.excluded)
+
+    def restrictions(self):
+        '''
+        Restricted sets from none to all of the words, including words
+        that are not rhymes at all
+        '''
+
+        rng = random.Random(0)
+        yield set()
+        yield set(['missing'])
+        for size in range(1, len(self.words) + 1):
+            yield set(rng.sample(self.words, size)) | set(['missing'])
+
+    def test_set(self):
+        rest = set(self.words) - self.excluded
+
+        self.assertEqual(list(self.rhymes), sorted(rest))
+        self.assertEqual(len(self.rhymes), len(rest))
+        for word in self.words:
+            self.assertEqual(word in self.rhymes, word in rest)
+
+        self.assertEqual(set(self.rhymes.exclude(['w05'])), set(self.words) - set(['w05']))
+        self.assertIs(self.rhymes.exclude(['w05']).words, self.rhymes.words)
+
+    def test_count(self):
+        for restricted in self.restrictions():
+            rest = set(self.words) - self.excluded - restricted
+            self.assertEqual(self.rhymes.count(restricted), len(rest), restricted)
+            self.assertEqual(self.rhymes.without(restricted), rest)
+
+    def test_sample(self):
+        random.seed(0)
+
+        for restricted in self.restrictions():
+            rest = set(self.words) - self.excluded - restricted
+
+            for _ in range(50):
+                word = self.rhymes.sample(restricted)
+
+                if len(rest) == 0:
+                    self.assertIsNone(word)
+                else:
+                    self.assertIn(word, rest, restricted)
+
+    def test_sample_past_rejection(self):
+        # With a single word left, the draws are bound to miss it at times,
+        # so the rest is listed rather than drawn
+        random.seed(0)
+        restricted = set(self.words[3:-1])
+
+        for _ in range(20 * REJECTION_TRIES):
+            self.assertEqual(self.rhymes.sample(restricted), self.words[-1])
+
+    def test_all_excluded(self):
+        rhymes = RhymeSet(self.words, self.words)
+
+        self.assertEqual(len(rhymes), 0)
+        self.assertEqual(list(rhymes), [])
+        self.assertEqual(rhymes.count(), 0)
+        self.assertEqual(rhymes.without(), set())
+        self.assertIsNone(rhymes.sample())
+        self.assertIsNone(RhymeSet([]).sample())
+
+if __name__ == '__main__':
+    unittest.main()
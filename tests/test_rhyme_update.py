@@ -0,0 +1,46 @@
+import random
+import unittest
+
+from prons import pron_dict
+from rhyme_index import build_rhyme_classes, build_rhyme_sets, update_rhyme_classes, update_rhyme_sets
+
+class TestUpdateRhymeSets(unittest.TestCase):
+
+    def test_matches_rebuild(self):
+        for seed in range(5):
+            prons = pron_dict(seed=seed)
+            rng = random.Random(seed)
+
+            vocabulary = sorted(prons)
+            word_list = set(rng.sample(vocabulary, 200))
+            rhyme_sets = build_rhyme_sets(word_list, prons)
+
+            for _ in range(5):
+                added = set(rng.sample(vocabulary, 10)) - word_list
+                removed = set(rng.sample(sorted(word_list), 10))
+                word_list = (word_list | added) - removed
+
+                update_rhyme_sets(rhyme_sets, word_list, prons, added, removed)
+                self.assertEqual(rhyme_sets, build_rhyme_sets(word_list, prons))
+
+class TestUpdateRhymeClasses(unittest.TestCase):
+
+    def test_matches_rebuild(self):
+        for seed in range(5):
+            prons = pron_dict(seed=seed)
+            rng = random.Random(seed)
+
+            vocabulary = sorted(prons)
+            word_list = set(rng.sample(vocabulary, 200))
+            packed = build_rhyme_classes(word_list, prons)
+
+            for _ in range(5):
+                added = set(rng.sample(vocabulary, 10)) - word_list
+                removed = set(rng.sample(sorted(word_list), 10))
+                word_list = (word_list | added) - removed
+
+                packed, _ = update_rhyme_classes(packed, word_list, prons, added, removed)
+                self.assertEqual(packed, build_rhyme_classes(word_list, prons))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import os
+import pickle
+import random
+import tempfile
+import unittest
+import warnings
+
+from poetry import Poet
+from prons import load_poet, optimal_level, pron_dict, scan_rhymes, write_corpus
+from rhyme_index import build_rhyme_classes
+from rhyme_set import RhymeClasses
+
+class TestRhymeTrie(unittest.TestCase):
+
+    def test_rhymes_at_matches_full_scan(self):
+        for seed in range(3):
+            prons = pron_dict(seed=seed)
+            words = sorted(prons)
+            rhyme_dict = RhymeClasses(build_rhyme_classes(words, prons))
+
+            for word in words:
+                self.assertEqual(rhyme_dict.rhyme_level(word), optimal_level(word, prons))
+
+                for level in (1, 2, 3, 4):
+                    rhymes = rhyme_dict.rhymes_at(word, level)
+                    self.assertEqual(set(rhymes or ()), scan_rhymes(word, level, words, prons),
+                        (word, level))
+                    self.assertTrue(rhymes is None or len(rhymes) > 0)
+
+    def test_tail_sets_are_shared(self):
+        prons = pron_dict(seed=4)
+        words = sorted(prons)
+        trie = RhymeClasses(build_rhyme_classes(words, prons)).trie
+
+        for index in range(len(words)):
+            for level in (1, 2, 3):
+                self.assertEqual(set(trie.rhyme_set(index, level)), trie.rhymes(index, level))
+
+        # Words of a single pronunciation share the words of its tail
+        tails = {}
+        for index, word in enumerate(words):
+            if len(prons[word]) == 1 and len(prons[word][0]) >= 2:
+                tail = tuple(prons[word][0][-2:])
+                shared = tails.setdefault(tail, trie.rhyme_set(index, 2).words)
+                self.assertIs(trie.rhyme_set(index, 2).words, shared)
+
+class TestSlantRhymes(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.prons = pron_dict(seed=1)
+        cls.filename = write_corpus(cls.directory.name, cls.prons)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def poet(self, **kwargs):
+        return load_poet(self.directory.name, self.filename, **kwargs)
+
+    def test_loose_rhymes(self):
+        p = self.poet(slant_level=1)
+        strict = self.poet()
+
+        for word in p.word_list:
+            rhymes = set(p.rhymes(word) or ())
+            self.assertEqual(set(strict.loose_rhymes(word) or ()), rhymes)
+
+            expected = rhymes
+            if p.rhyme_dict.rhyme_level(word) > 1:
+                expected = rhymes | set(p.rhymes(word, 1) or ())
+            self.assertEqual(set(p.loose_rhymes(word) or ()), expected, word)
+
+    def test_rhyme_falls_back_on_slant_rhymes(self):
+        p = self.poet(slant_level=1)
+        fallbacks = 0
+
+        for word in p.word_list:
+            strict = set(p.rhymes(word) or ())
+            slant = p.rhymes(word, 1)
+            if p.rhyme_dict.rhyme_level(word) == 1 or slant is None or len(slant.without(strict)) == 0:
+                continue
+
+            with p.measure() as metrics:
+                rhyme_word = p.rhyme(word, restricted=strict)
+
+            self.assertIn(rhyme_word, slant)
+            self.assertNotIn(rhyme_word, strict)
+            self.assertEqual(metrics.counts.get('slant'), 1)
+            fallbacks += 1
+
+            # Without a slant level, the strict rhymes are all there is
+            self.assertIsNone(self.poet().rhyme(word, restricted=strict))
+            break
+
+        self.assertEqual(fallbacks, 1)
+
+    def test_multi_line_draws_what_feasibility_counted(self):
+        # The seed lines count slant rhymes that fit the pattern, so the
+        # lines rhyming with them must be drawn from those, not from the
+        # strict rhymes left over that do not fit
+        for engine in Poet.ENGINES:
+            p = self.poet(engine=engine, slant_level=1)
+
+            for seed in range(30):
+                random.seed(seed)
+
+                with p.budget(attempts=5000):
+                    line = p.generate_seed_line(8, min_rhymes=5)
+                    pattern = p.cadence(' '.join(line))
+                    lines = p.generate_multi_line(pattern, line[-1], 5)
+
+                rhymes = [rhyme_line[-1] for rhyme_line in lines]
+                self.assertEqual(len(set(rhymes)), 5)
+                self.assertTrue(set(rhymes) <= set(p.loose_rhymes(line[-1])))
+
+    def test_strict_rhymes_that_do_not_fit(self):
+        # All five strict rhymes of 'wcary' are enough to pass for the
+        # five lines, but one is longer than the line, so the fifth line
+        # has to fall back on the slant rhymes counted as feasible
+        prons = {
+            'wcary': [['K', 'AE1', 'R', 'IY0']],
+            'wbary': [['B', 'AE1', 'R', 'IY0']],
+            'wdary': [['D', 'AE1', 'R', 'IY0']],
+            'wtary': [['T', 'AE1', 'R', 'IY0']],
+            'wsary': [['S', 'AE1', 'R', 'IY0']],
+            'wlong': [['AH0', 'B'] * 7 + ['AE1', 'R', 'IY0']],
+            'wlee': [['L', 'IY1']],
+            'wbee': [['B', 'IY1']],
+            'wba': [['B', 'AA1']],
+            'wda': [['D', 'AA1']],
+        }
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = write_corpus(directory, prons)
+
+            for engine in Poet.ENGINES:
+                p = load_poet(directory, filename, engine=engine, slant_level=1)
+
+                pattern = p.cadence('wba wda wba wda wba wda wcary')
+                self.assertTrue(p.enough_rhymes(['wcary'], 5, pattern))
+
+                for seed in range(10):
+                    random.seed(seed)
+                    with p.budget(attempts=1000):
+                        lines = p.generate_multi_line(pattern, 'wcary', 5)
+
+                    rhymes = set(line[-1] for line in lines)
+                    self.assertEqual(len(rhymes), 5)
+                    self.assertNotIn('wlong', rhymes)
+
+    def test_forms_compose(self):
+        for engine in Poet.ENGINES:
+            p = self.poet(engine=engine, slant_level=1)
+
+            for seed in range(10):
+                random.seed(seed)
+                with p.budget(attempts=20000):
+                    p.string_ballade()
+                    p.string_villanelle()
+                    p.string_limerick()
+
+    def test_warns_without_trie(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = write_corpus(directory, self.prons)
+
+            # Compiled without the trie, as the shipped dictionaries are
+            rhyme_file = os.path.splitext(filename)[0] + '.pkl'
+            with open(rhyme_file, 'rb') as f:
+                packed = pickle.load(f)
+            for key in ('phonemes', 'trie_keys', 'trie_words', 'levels'):
+                del packed[key]
+            with open(rhyme_file, 'wb') as f:
+                pickle.dump(packed, f)
+
+            with self.assertWarns(UserWarning):
+                load_poet(directory, filename, slant_level=2)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', UserWarning)
+            self.poet(slant_level=2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+import functools
+import itertools
+import random
+import tempfile
+import unittest
+
+from prons import load_poet, pron_dict, write_corpus
+
+def matches(cad, pattern):
+    '''
+    Returns whether the cadence of a word matches the pattern, as in
+    Poet.cadence_match(), where an unstressed syllable fits a '*'
+    '''
+
+    return len(cad) <= len(pattern) and all(c == p or c == '0' and p == '*'
+        for c, p in zip(cad, pattern))
+
+class TestLineSolver(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.filename = write_corpus(cls.directory.name, pron_dict(num_words=80, seed=3))
+        cls.poet = load_poet(cls.directory.name, cls.filename, engine='solver', slant_level=1)
+        cls.solver = cls.poet.solver
+
+        # The words the solver fills lines with, leaving out the complex ones
+        cls.words = sorted(word for bucket in cls.poet.stress_index.values() for word in bucket)
+
+        cls.patterns = [''.join(letters) for length in range(1, 7)
+            for letters in itertools.product('012*', repeat=length)]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    @functools.lru_cache(maxsize=None)
+    def brute_feasible(self, pattern):
+        '''
+        Whether the pattern can be filled, trying every word in turn
+        '''
+
+        if pattern == '':
+            return True
+
+        return any(matches(self.poet.stress(word), pattern) and
+            self.brute_feasible(pattern[self.poet.nsyl(word):]) for word in self.words)
+
+    def brute_usable(self, pattern, word, rhymes):
+        return [rhyme_word for rhyme_word in sorted(rhymes or ()) if rhyme_word != word
+            and self.poet.nsyl(rhyme_word) <= len(pattern)
+            and self.brute_feasible(self.solver.line_pattern(pattern[:len(pattern) - self.poet.nsyl(rhyme_word)]))]
+
+    def test_feasible(self):
+        for pattern in self.patterns:
+            self.assertEqual(self.solver.feasible(pattern), self.brute_feasible(pattern), pattern)
+
+    def test_moves(self):
+        for pattern in self.patterns:
+            buckets, cum_weights = self.solver.moves(pattern)
+            self.assertEqual(cum_weights, list(itertools.accumulate(map(len, buckets))))
+
+            for bucket in buckets:
+                for word in bucket:
+                    self.assertTrue(matches(self.poet.stress(word), pattern))
+                    self.assertTrue(self.brute_feasible(pattern[self.poet.nsyl(word):]))
+
+    def test_fill(self):
+        random.seed(0)
+
+        for pattern in self.patterns:
+            if not self.brute_feasible(pattern):
+                continue
+
+            for _ in range(3):
+                line = self.solver.fill(pattern)
+                self.assertEqual(sum(map(self.poet.nsyl, line)), len(pattern))
+
+                rest = pattern
+                for word in line:
+                    self.assertTrue(matches(self.poet.stress(word), rest), (line, pattern))
+                    rest = rest[self.poet.nsyl(word):]
+
+    def test_infeasible_stress_line(self):
+        for pattern in self.patterns:
+            if not self.brute_feasible(self.solver.line_pattern(pattern)):
+                self.assertEqual(self.solver.generate_stress_line(pattern), [None])
+
+    def test_usable_rhymes(self):
+        poet = self.poet
+        patterns = [pattern for pattern in self.patterns if len(pattern) >= 4][::37]
+
+        for pattern in patterns:
+            for word in poet.word_list:
+                self.assertEqual(self.solver.usable_rhymes(pattern, word),
+                    self.brute_usable(pattern, word, poet.rhymes(word)))
+                self.assertEqual(self.solver.usable_rhymes(pattern, word, level=1),
+                    self.brute_usable(pattern, word, poet.rhymes(word, 1)))
+                self.assertEqual(self.solver.usable_rhymes(pattern, word, slant=True),
+                    self.brute_usable(pattern, word, poet.loose_rhymes(word)))
+
+    def test_rhyme_cache(self):
+        poet = self.poet
+        pattern = '0101010101'
+
+        # A word whose slant rhymes differ from its strict ones
+        word = next(word for word in poet.word_list
+            if set(poet.rhymes(word, 1) or ()) != set(poet.rhymes(word) or ()))
+
+        strict = self.solver.usable_rhymes(pattern, word)
+        slant = self.solver.usable_rhymes(pattern, word, level=1)
+        loose = self.solver.usable_rhymes(pattern, word, slant=True)
+
+        self.assertNotEqual(strict, slant)
+        self.assertEqual(self.solver.usable_rhymes(pattern, word), strict)
+        for key in ((pattern, word, None, False), (pattern, word, 1, False), (pattern, word, None, True)):
+            self.assertIn(key, self.solver.rhyme_cache)
+
+        # The restricted words are left out of a copy, not of the cache
+        self.assertNotIn(loose[0], self.solver.usable_rhymes(pattern, word, {loose[0]}, slant=True))
+        self.assertEqual(self.solver.usable_rhymes(pattern, word, slant=True), loose)
+
+    def test_seed_words(self):
+        poet = self.poet
+
+        for pattern in ('01010101', '10101010', '0101010101'):
+            line_pattern = self.solver.line_pattern(pattern)
+
+            for min_rhymes in (1, 2, 3):
+                expected = set(word for word in self.words
+                    if matches(poet.stress(word)[::-1], line_pattern[::-1])
+                    and self.brute_feasible(line_pattern[:len(line_pattern) - poet.nsyl(word)])
+                    and len(self.brute_usable(pattern, word, poet.loose_rhymes(word))) >= min_rhymes)
+
+                self.assertEqual(set(self.solver.seed_words(pattern, min_rhymes)), expected)
+                self.assertTrue(len(expected) > 0)
+
+    @functools.lru_cache(maxsize=None)
+    def brute_chars(self, pattern):
+        '''
+        The fewest characters the pattern can be filled with, trying every
+        word in turn
+        '''
+
+        lengths = [len(word) + (self.brute_chars(pattern[self.poet.nsyl(word):]) + 1
+            if len(pattern) > self.poet.nsyl(word) else 0)
+            for word in self.words if matches(self.poet.stress(word), pattern)]
+
+        return min(lengths, default=float('inf'))
+
+    def test_min_chars(self):
+        for pattern in self.patterns:
+            self.assertEqual(self.solver.min_chars(pattern), self.brute_chars(pattern), pattern)
+
+    def test_fill_short(self):
+        random.seed(0)
+
+        for pattern in self.patterns[::7]:
+            least = self.brute_chars(pattern)
+            if least == float('inf'):
+                continue
+
+            for max_chars in (least, least + 3, least + 20):
+                line = self.solver.fill_short(pattern, max_chars)
+
+                # Within the budget, the line is never cut
+                self.assertNotIn(None, line)
+                self.assertLessEqual(len(' '.join(line)), max_chars)
+                self.assertEqual(sum(map(self.poet.nsyl, line)), len(pattern))
+
+            line = self.solver.fill_short(pattern, least - 1)
+            self.assertEqual(line[-1], None)
+            self.assertLessEqual(len(' '.join(line[:-1])), least - 1)
+
+    def test_short_seeds(self):
+        for pattern in ('01010101', '10101010', '0101010101'):
+            line_pattern = self.solver.line_pattern(pattern)
+            seeds = self.solver.seed_words(pattern, 2)
+
+            for max_chars in (10, 20, 40):
+                expected = set(word for word in seeds
+                    if len(word) + (self.brute_chars(line_pattern[:len(line_pattern) - self.poet.nsyl(word)]) + 1
+                    if len(line_pattern) > self.poet.nsyl(word) else 0) <= max_chars)
+
+                self.assertEqual(set(self.solver.short_seeds(pattern, 2, max_chars)), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,6 +13,7 @@ import random
 
 from keys import *
 from poetry import Poet
+from poem_pool import PoemPool
 
 import os
 import sys
@@ -22,71 +23,45 @@ path = os.path.abspath(os.path.dirname(sys.argv[0]))
 
 poet = Poet(path + '/data/english.txt')
 
-def make_short_limerick():
-    limerick = poet.compose_limerick()
+# Characters allowed in a tweet
+MAX_CHARS = 140
 
-    final_lim = make_poem(limerick)
+def is_complete(poem):
+    '''
+    Returns whether no line of the poem was left out or cut off
+    '''
 
-    while len(final_lim) > 140:
-        limerick = poet.compose_limerick()
+    return all(line is not None and None not in line for line in poem)
 
-        final_lim = make_poem(limerick)
+def make_short(compose):
+    '''
+    Composes a poem within the character limit of a tweet
 
-    return final_lim
+    The poem is composed to fit the limit, so it only needs to be
+    composed again in the rare case that it does not
+    '''
 
-def make_short_haiku():
-    haiku = poet.compose_haiku()
+    poem = compose(max_chars=MAX_CHARS)
 
-    final_haiku = make_poem(haiku)
+    while not is_complete(poem) or len(make_poem(poem)) > MAX_CHARS:
+        poem = compose(max_chars=MAX_CHARS)
 
-    while len(final_haiku) > 140:
-        haiku = poet.compose_haiku()
+    return make_poem(poem)
 
-        final_haiku = make_poem(haiku)
+def make_short_limerick():
+    return make_short(poet.compose_limerick)
 
-    return final_haiku
+def make_short_haiku():
+    return make_short(poet.compose_haiku)
 
 def make_short_love_poem():
-    love_poem = poet.compose_love_poem()
-
-    while None in love_poem:
-        love_poem = poet.compose_love_poem()
-
-    final_love_poem = make_poem(love_poem)
-
-    while len(final_love_poem) > 140:
-        love_poem = poet.compose_love_poem()
-
-        final_love_poem = make_poem(love_poem)
-
-    return final_love_poem
+    return make_short(poet.compose_love_poem)
 
 def make_short_doublet():
-    doublet = poet.compose_doublet()
-
-    while None in doublet:
-        doublet = poet.compose_doublet()
-
-    final_doublet = make_poem(doublet)
-
-    while len(final_doublet) > 140:
-        doublet = poet.compose_doublet()
-
-        final_doublet = make_poem(doublet)
-
-    return final_doublet
+    return make_short(poet.compose_doublet)
 
 def make_short_quatrain():
-    quatrain = poet.compose_quatrain()
-
-    final_quatrain = make_poem(quatrain)
-
-    while len(final_quatrain) > 140:
-        quatrain = poet.compose_quatrain()
-
-        final_quatrain = make_poem(quatrain)
-
-    return final_quatrain
+    return make_short(poet.compose_quatrain)
 
 def make_poem(poem):
     final = ''
@@ -98,22 +73,34 @@ def make_poem(poem):
 
     return final
 
-def tweet():
+# Short poems for tweeting, by form
+makers = {
+    'limerick': make_short_limerick, 
+    'haiku': make_short_haiku, 
+    'love_poem': make_short_love_poem, 
+    'doublet': make_short_doublet,
+    'quatrain': make_short_quatrain}
+
+def make_pool(low=2, high=8, filename=None):
+    '''
+    Starts a pool of pre-composed short poems to tweet from
+    '''
+
+    return PoemPool(poet, low=low, high=high, filename=filename, makers=makers)
+
+def tweet(pool=None):
     auth = tweepy.OAuthHandler(consumerKey, consumerKeySecret)
     auth.set_access_token(accessToken, accessTokenSecret)
 
     api = tweepy.API(auth)
 
-    poetry_methods = [
-    make_short_limerick, 
-    make_short_haiku, 
-    make_short_love_poem, 
-    make_short_doublet,
-    make_short_quatrain]
-
-    random_poem = random.choice(poetry_methods)
+    # Serve from the pool if there is one, rather than composing now
+    if pool is not None:
+        tweet = pool.pop('random')
+    else:
+        random_poem = random.choice(list(makers.values()))
 
-    tweet = random_poem()
+        tweet = random_poem()
 
     api.update_status(tweet)
     